@@ -1,14 +1,13 @@
 import streamlit as st
-from auth import register_user, get_user_by_login, verify_password
+from auth import register_user, authenticate
+from session_utils import create_session, get_session_user
 
 
 st.set_page_config(page_title ="Login | Signup")
 
-# Simulate session state
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-if "current_user" not in st.session_state:
-    st.session_state.current_user = None
+# Only the signed session token is kept in session state
+if "session_token" not in st.session_state:
+    st.session_state.session_token = None
 
 #login | Signup Tab
 st.title("Welcome to :red[Chatbot]")
@@ -34,11 +33,10 @@ with tab1:
             st.warning("Please fill both username/email and password")
         else:
             try:
-                user = get_user_by_login(login_identifier)
+                user = authenticate(login_identifier, password)
                 
-                if user and verify_password(password, user["password_hash"]):
-                    st.session_state.logged_in = True
-                    st.session_state.current_user = user
+                if user:
+                    st.session_state.session_token = create_session(user)
                     st.success("Logged in successfully!")
                     
                     # based on user type
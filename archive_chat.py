@@ -0,0 +1,17 @@
+# archive_chat.py
+# Moves old chat messages to chat_messages_archive and deletes empty chat sessions.
+# Run regularly (e.g. nightly from cron).
+# Usage: python archive_chat.py [--months 12] [--batch-size 5000]
+import argparse
+from checklist_utils import archive_chat_messages, prune_empty_chat_sessions, CHAT_ARCHIVE_MONTHS
+
+parser = argparse.ArgumentParser(description="Chat message archival")
+parser.add_argument("--months", type=int, default=CHAT_ARCHIVE_MONTHS, help="Archive messages older than this")
+parser.add_argument("--batch-size", type=int, default=5000, help="Messages moved per transaction")
+args = parser.parse_args()
+
+archived = archive_chat_messages(months=args.months, batch_size=args.batch_size)
+print(f"Archived {archived} chat messages older than {args.months} months")
+
+pruned = prune_empty_chat_sessions()
+print(f"Deleted {pruned} empty chat sessions")
@@ -1,19 +1,144 @@
 import bcrypt
 import mysql.connector
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
 from db_utils import get_db_cursor
+from cache_utils import invalidate_tags
+
+load_dotenv()
+
+# bcrypt cost factor; existing hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt runs on a bounded worker pool: at most BCRYPT_WORKERS hashes run at once and at most
+# BCRYPT_MAX_PENDING wait, so a burst of logins can't start an unbounded number of bcrypt calls.
+# This limits concurrency and CPU use; it does not make a single login faster.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "4"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+BCRYPT_WAIT_SECONDS = float(os.getenv("BCRYPT_WAIT_SECONDS", "10"))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_PENDING)
+
+# Login attempts in the last LOGIN_STATS_WINDOW seconds: (timestamp, success, bcrypt seconds)
+LOGIN_STATS_WINDOW = 60
+_login_events = deque()
+_login_events_lock = threading.Lock()
 
 def hash_password(password: str) -> str:
     # Generate a hashed version of the password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 def verify_password(plain_password:str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def submit_to_bcrypt_pool(function, *args, wait_seconds=BCRYPT_WAIT_SECONDS):
+    """
+    Submits a bcrypt call to the bounded worker pool and returns its future.
+    Every bcrypt call goes through here, so running and waiting calls never exceed
+    BCRYPT_WORKERS + BCRYPT_MAX_PENDING.
+    Raises TimeoutError if no slot frees up within wait_seconds.
+    """
+    if not _bcrypt_slots.acquire(timeout=wait_seconds):
+        raise TimeoutError("Too many logins at the moment. Please try again.")
+    try:
+        future = _bcrypt_pool.submit(function, *args)
+    except Exception:
+        _bcrypt_slots.release()
+        raise
+    future.add_done_callback(lambda _: _bcrypt_slots.release())
+    return future
+
+def run_on_bcrypt_pool(function, *args):
+    """
+    Runs a bcrypt call on the bounded worker pool and waits for the result
+    (the caller blocks; the pool only bounds how many calls run at once).
+    Raises TimeoutError if the pool is saturated for longer than BCRYPT_WAIT_SECONDS.
+    """
+    return submit_to_bcrypt_pool(function, *args).result(timeout=BCRYPT_WAIT_SECONDS)
+
+def needs_rehash(hashed_password: str) -> bool:
+    """ True if the hash was created with a different cost factor than BCRYPT_ROUNDS """
+    try:
+        # bcrypt hashes look like $2b$12$<salt+hash>
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def rehash_password(user_id: int, plain_password: str):
+    """ Stores a new hash with the current cost factor (runs on the bcrypt pool) """
+    try:
+        new_hash = hash_password(plain_password)
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s", (new_hash, user_id))
+            conn.commit()
+    except Exception as e:
+        print(f"Rehash failed for user {user_id}: {e}")
+
+def record_login(success: bool, bcrypt_seconds: float):
+    """ Records a login attempt for get_login_stats """
+    now = time.time()
+    with _login_events_lock:
+        _login_events.append((now, success, bcrypt_seconds))
+        while _login_events and _login_events[0][0] < now - LOGIN_STATS_WINDOW:
+            _login_events.popleft()
+
+def get_login_stats() -> dict:
+    """
+    Login throughput over the last LOGIN_STATS_WINDOW seconds
+    
+    return:
+        dict: attempts, successful logins, logins per second and average bcrypt time in ms
+    """
+    now = time.time()
+    with _login_events_lock:
+        events = [event for event in _login_events if event[0] >= now - LOGIN_STATS_WINDOW]
+    
+    successful = sum(1 for _, success, _ in events if success)
+    return {
+        'attempts': len(events),
+        'successful': successful,
+        'logins_per_second': successful / LOGIN_STATS_WINDOW,
+        'avg_bcrypt_ms': (sum(seconds for _, _, seconds in events) / len(events) * 1000) if events else 0
+    }
+
+def authenticate(login_identifier: str, password: str):
+    """
+    Verifies credentials on the bcrypt pool and rehashes outdated hashes.
+    
+    return:
+        dict: The user row without password_hash, or None if the credentials are invalid
+    """
+    user = get_user_by_login(login_identifier)
+    if not user:
+        record_login(False, 0.0)
+        return None
+    
+    started = time.perf_counter()
+    valid = run_on_bcrypt_pool(verify_password, password, user["password_hash"])
+    record_login(valid, time.perf_counter() - started)
+    if not valid:
+        return None
+    
+    if needs_rehash(user["password_hash"]):
+        # fire and forget: the login does not wait for the new hash. If the pool is
+        # saturated the rehash is skipped and happens on a later login.
+        try:
+            submit_to_bcrypt_pool(rehash_password, user["user_id"], password, wait_seconds=0)
+        except TimeoutError:
+            pass
+    
+    return {key: value for key, value in user.items() if key != "password_hash"}
+
 def register_user(username: str, password: str, email: str, user_type:str):
         
-    hashed = hash_password(password)
+    hashed = run_on_bcrypt_pool(hash_password, password)
     try:
         with get_db_cursor() as (conn, cursor):
         
@@ -28,6 +153,7 @@ def register_user(username: str, password: str, email: str, user_type:str):
             VALUES (%s, %s, %s,%s)
             """, (username, hashed, email, user_type))
             conn.commit()
+            invalidate_tags('users')
             return True
     except mysql.connector.Error as e:
         print(f"Registration failed: {e}")
@@ -47,5 +173,15 @@ def get_user_by_login(login_identifier: str):
     except mysql.connector.Error as e:
         print(f"Error fetching user: {e}")
         return None
-    
-        
\ No newline at end of file
+
+def get_user_by_id(user_id: int):
+    """ 
+    Fetches a user by id, without the password hash.
+    """
+    try:
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute("SELECT user_id, username, email, user_type FROM users WHERE user_id = %s", (user_id,))
+            return cursor.fetchone()
+    except mysql.connector.Error as e:
+        print(f"Error fetching user: {e}")
+        return None
@@ -0,0 +1,41 @@
+# bench_logins.py
+# Measures sustained logins per second through authenticate() (bcrypt pool included).
+# Usage: python bench_logins.py --login <username> --password <password> [--threads 16] [--seconds 30]
+import argparse
+import threading
+import time
+from auth import authenticate, get_login_stats, BCRYPT_ROUNDS, BCRYPT_WORKERS
+
+parser = argparse.ArgumentParser(description="Login throughput benchmark")
+parser.add_argument("--login", required=True, help="Username or email of an existing user")
+parser.add_argument("--password", required=True)
+parser.add_argument("--threads", type=int, default=16, help="Concurrent simulated users")
+parser.add_argument("--seconds", type=int, default=30, help="Benchmark duration")
+args = parser.parse_args()
+
+deadline = time.time() + args.seconds
+counts = {'ok': 0, 'failed': 0}
+counts_lock = threading.Lock()
+
+def login_loop():
+    while time.time() < deadline:
+        try:
+            ok = authenticate(args.login, args.password) is not None
+        except TimeoutError:
+            ok = False
+        with counts_lock:
+            counts['ok' if ok else 'failed'] += 1
+
+threads = [threading.Thread(target=login_loop) for _ in range(args.threads)]
+started = time.time()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.time() - started
+
+stats = get_login_stats()
+print(f"bcrypt rounds: {BCRYPT_ROUNDS}, workers: {BCRYPT_WORKERS}, threads: {args.threads}")
+print(f"Successful logins: {counts['ok']}, failed: {counts['failed']} in {elapsed:.1f}s")
+print(f"Sustained logins/s: {counts['ok'] / elapsed:.2f}")
+print(f"Average bcrypt time: {stats['avg_bcrypt_ms']:.1f} ms")
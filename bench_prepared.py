@@ -0,0 +1,55 @@
+# bench_prepared.py
+# Compares the hot checklist queries as plain text-protocol queries vs. cached prepared statements.
+# Writes are rolled back, so the benchmark leaves the data unchanged.
+# Usage: python bench_prepared.py --position <position_id> --task <task_id> --user <user_id> [--iterations 500]
+import argparse
+import time
+from db_utils import get_db_cursor, execute_prepared, fetchall_dicts
+from checklist_utils import (SHARED_PROCEDURE_QUERY, POSITION_BA_QUERY, UPSERT_SHARED_PROGRESS,
+                             BUMP_PROGRESS_VERSION, LATEST_UPLOAD_QUERY)
+
+parser = argparse.ArgumentParser(description="Prepared statement benchmark")
+parser.add_argument("--position", type=int, required=True, help="Existing position_id")
+parser.add_argument("--task", type=int, required=True, help="Task of that position's procedure")
+parser.add_argument("--user", type=int, required=True, help="Existing user_id")
+parser.add_argument("--iterations", type=int, default=500)
+args = parser.parse_args()
+
+with get_db_cursor() as (conn, cursor):
+    cursor.execute(POSITION_BA_QUERY, (args.position,))
+    ba_id = cursor.fetchone()['ba_id']
+
+statements = [
+    ("shared procedure data", SHARED_PROCEDURE_QUERY, (args.position,), False),
+    ("position ba_id", POSITION_BA_QUERY, (args.position,), False),
+    ("latest upload", LATEST_UPLOAD_QUERY, (args.task, args.position), False),
+    ("status upsert", UPSERT_SHARED_PROGRESS,
+     (args.position, args.task, ba_id, 'in_progress', args.user, args.user, None, 'in_progress'), True),
+    ("version bump", BUMP_PROGRESS_VERSION, (args.position,), True),
+]
+
+def run_text(conn, cursor, sql, params, is_write):
+    cursor.execute(sql, params)
+    if not is_write:
+        cursor.fetchall()
+
+def run_prepared(conn, cursor, sql, params, is_write):
+    prepared = execute_prepared(conn, sql, params)
+    if not is_write:
+        fetchall_dicts(prepared)
+
+def measure(run, sql, params, is_write):
+    with get_db_cursor() as (conn, cursor):
+        run(conn, cursor, sql, params, is_write)  # warm up (prepares the statement once)
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            run(conn, cursor, sql, params, is_write)
+        elapsed = time.perf_counter() - started
+        conn.rollback()
+    return elapsed / args.iterations * 1000
+
+print(f"{'statement':<24}{'text ms':>10}{'prepared ms':>14}{'speedup':>10}")
+for name, sql, params, is_write in statements:
+    text_ms = measure(run_text, sql, params, is_write)
+    prepared_ms = measure(run_prepared, sql, params, is_write)
+    print(f"{name:<24}{text_ms:>10.3f}{prepared_ms:>14.3f}{text_ms / prepared_ms:>9.2f}x")
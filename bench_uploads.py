@@ -0,0 +1,65 @@
+# bench_uploads.py
+# Compares document storage without compression, with gzip and with zstd (if installed):
+# bytes written to disk, write time and read latency through upload_utils.
+# Uses the given sample documents (e.g. requirement profiles) or generated German text.
+# Usage: python bench_uploads.py [--files profile1.txt profile2.txt] [--documents 200] [--iterations 5]
+import argparse
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+from upload_utils import write_document, open_document_text, zstandard
+
+parser = argparse.ArgumentParser(description="Upload compression benchmark")
+parser.add_argument("--files", nargs="*", help="Sample documents (default: generated text)")
+parser.add_argument("--documents", type=int, default=200, help="Documents stored per codec")
+parser.add_argument("--size-kb", type=int, default=20, help="Size of a generated document")
+parser.add_argument("--iterations", type=int, default=5, help="Reads per document")
+args = parser.parse_args()
+
+WORDS = ("Anforderungsprofil Professur Berufungsverfahren Lehre Forschung Drittmittel Publikationen "
+         "Habilitation Berufungskommission Gutachten Fakultät Lehrdeputat Promotion Schwerpunkt "
+         "Kooperation Nachwuchsförderung interdisziplinär Bewerbung Ausschreibung Kenziffer").split()
+
+if args.files:
+    samples = []
+    for path in args.files:
+        with open(path, 'rb') as f:
+            samples.append(f.read())
+else:
+    rng = random.Random(42)
+    samples = [" ".join(rng.choice(WORDS) for _ in range(args.size_kb * 100)).encode('utf-8') for _ in range(10)]
+
+codecs = [None, 'gzip'] + (['zstd'] if zstandard is not None else [])
+if zstandard is None:
+    print("zstandard is not installed, skipping zstd\n")
+
+results = {}
+for codec in codecs:
+    with tempfile.TemporaryDirectory() as directory:
+        paths, written = [], 0
+        started = time.perf_counter()
+        for i in range(args.documents):
+            path = write_document(io.BytesIO(samples[i % len(samples)]), os.path.join(directory, f"{i}.txt"), codec)
+            paths.append(path)
+            written += os.path.getsize(path)
+        write_seconds = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(args.iterations):
+            for path in paths:
+                started = time.perf_counter()
+                with open_document_text(path) as f:
+                    f.read()
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        results[codec] = (written, write_seconds, statistics.mean(latencies), latencies[int(len(latencies) * 0.95)])
+
+original = results[None][0]
+print(f"{args.documents} documents, {original / args.documents / 1024:.1f} KB on average\n")
+print(f"{'codec':<8}{'stored MB':>11}{'saved':>8}{'write ms/doc':>14}{'read ms':>10}{'read p95':>10}")
+for codec, (written, write_seconds, mean_ms, p95_ms) in results.items():
+    print(f"{codec or 'none':<8}{written / 1024 / 1024:>11.2f}{(1 - written / original) * 100:>7.1f}%"
+          f"{write_seconds / args.documents * 1000:>14.3f}{mean_ms:>10.3f}{p95_ms:>10.3f}")
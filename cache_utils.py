@@ -0,0 +1,76 @@
+import copy
+import functools
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default lifetime of cached reference data (positions, procedures, users, BA groups)
+REFERENCE_CACHE_TTL_SECONDS = int(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "300"))
+
+# Process-wide cache shared by all Streamlit sessions:
+# key -> (value, expires_at); tag -> generation counter
+_cache = {}
+_tag_generations = {}
+_cache_lock = threading.Lock()
+
+
+def cached(tags, ttl_seconds=REFERENCE_CACHE_TTL_SECONDS):
+    """
+    Caches the result of a lookup function per argument set.
+    Entries expire after ttl_seconds or when one of their tags is invalidated.
+    Callers get a copy, so mutating a returned row never changes the cache.
+
+    param:
+        tags(list[str]): Data the result depends on, e.g. ['positions', 'ba_groups']
+        ttl_seconds(int): Maximum age of a cached result
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            now = time.time()
+
+            with _cache_lock:
+                entry = _cache.get(key)
+                if entry and entry[1] > now and entry[2] == _current_generations(tags):
+                    return copy.deepcopy(entry[0])
+                generations = _current_generations(tags)
+
+            value = func(*args, **kwargs)
+
+            with _cache_lock:
+                # don't store a result that was invalidated while it was being loaded
+                if generations == _current_generations(tags):
+                    _cache[key] = (value, now + ttl_seconds, generations)
+            return copy.deepcopy(value)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def _current_generations(tags):
+    return tuple(_tag_generations.get(tag, 0) for tag in tags)
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidates every cached result that depends on one of the tags.
+    Call after writes that change the underlying data.
+    """
+    with _cache_lock:
+        for tag in tags:
+            _tag_generations[tag] = _tag_generations.get(tag, 0) + 1
+        # entries with an outdated generation are dropped lazily; prune expired ones now
+        now = time.time()
+        for key in [key for key, entry in _cache.items() if entry[1] <= now]:
+            del _cache[key]
+
+
+def clear_cache():
+    """ Drops all cached results """
+    with _cache_lock:
+        _cache.clear()
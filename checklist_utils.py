@@ -1,32 +1,226 @@
 from typing import Dict, Any, cast
-from db_utils import get_db_cursor
+from db_utils import get_db_cursor, execute_prepared, fetchall_dicts, fetchone_dict
+from cache_utils import cached
+from upload_utils import store_document, open_document_text, UPLOAD_ROOT
 import os
 from datetime import datetime
+from dotenv import load_dotenv
 
-def get_all_positions(user_id= None, user_type = None):
-    """
-    Fetches job positions based on user role.
-    HR sees all positions, BA only sees assigned positions
-    """
-    with get_db_cursor() as (conn, cursor):
-        if user_type == "HR":
-            cursor.execute("""
+load_dotenv()
+
+# A chat session is continued while its last message is younger than this
+CHAT_SESSION_IDLE_MINUTES = int(os.getenv("CHAT_SESSION_IDLE_MINUTES", "30"))
+
+# Chat messages older than this are moved to chat_messages_archive by archive_chat.py
+CHAT_ARCHIVE_MONTHS = int(os.getenv("CHAT_ARCHIVE_MONTHS", "12"))
+
+# =============================================================================
+# HOT STATEMENTS
+# Executed as server-side prepared statements, cached per pooled connection
+# =============================================================================
+
+SHARED_PROCEDURE_QUERY = """
+            SELECT p.procedure_title,
+                p.grundlage,
+                ph.phase_id,
+                ph.phase_title,
+                ph.phase_order,
+                ph.link_url as phase_link,
+                ps.step_id,
+                ps.step_title,
+                ps.step_order,
+                ps.link_url as step_link,
+                st.task_id,
+                st.task_description,
+                st.task_order,
+                st.required_documents,
+                st.link_url as task_link,
+                COALESCE(bsp.status, 'not_started') as task_status,
+                bsp.completed_at,
+                bsp.notes,
+                COALESCE(bsp.row_version, 0) as row_version
+            FROM job_positions jp
+            JOIN procedures p ON jp.procedure_id = p.procedure_id
+            JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
+            JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
+            JOIN step_tasks st ON ps.step_id = st.step_id
+            LEFT JOIN ba_shared_progress bsp ON st.task_id = bsp.task_id AND bsp.position_id = jp.position_id
+            LEFT JOIN users u ON bsp.completed_by_user_id = u.user_id  
+            WHERE jp.position_id = %s 
+            ORDER BY ph.phase_order, ps.step_order, st.task_order 
+            """
+
+POSITION_BA_QUERY = """
+            SELECT ba_id FROM job_positions WHERE position_id = %s
+            """
+
+UPSERT_SHARED_PROGRESS = """
+            INSERT INTO ba_shared_progress(position_id, task_id, ba_id, status, completed_by_user_id, updated_by_user_id, notes, completed_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, CASE WHEN %s = 'completed' THEN CURRENT_TIMESTAMP ELSE NULL END)
+            ON DUPLICATE KEY UPDATE 
+            status = VALUES(status),
+            completed_by_user_id = VALUES(completed_by_user_id),
+            updated_by_user_id = VALUES(updated_by_user_id),
+            notes = VALUES(notes),
+            completed_at = VALUES(completed_at),
+            row_version = row_version + 1
+            """
+
+BUMP_PROGRESS_VERSION = """
+            INSERT INTO ba_progress_versions (position_id, version)
+            VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+            """
+
+INSERT_CHAT_MESSAGE = """
+            INSERT INTO chat_messages(session_id, sender_type, message_text)
+            VALUES (%s, %s, %s)
+            """
+
+LATEST_UPLOAD_QUERY = """
+            SELECT du.upload_id,
+            du.version,
+            du.original_filename,
+            du.file_path,
+            u.username
+            FROM document_uploads du
+            JOIN users u ON du.user_id = u.user_id
+            WHERE du.task_id = %s AND du.position_id = %s AND du.deleted_at IS NULL
+            ORDER BY du.upload_id DESC
+            LIMIT 1
+            """
+
+# =============================================================================
+# QUERIES
+# Module level so verify_indexes.py can EXPLAIN them
+# =============================================================================
+
+HR_POSITIONS_QUERY = """
                 SELECT jp.position_id, jp.position_title, jp.kenziffer, jp.department,
                        ba.ba_name, bm.is_head  
                 FROM job_positions jp
                 LEFT JOIN berufungsausschuss ba ON jp.ba_id = ba.ba_id
                 LEFT JOIN ba_members bm ON ba.ba_id = bm.ba_id
                 WHERE jp.status IN ('created', 'in_progress')
-            """)
-        else:
-            cursor.execute("""
+            """
+
+USER_POSITIONS_QUERY = """
                 SELECT jp.position_id, jp.position_title, jp.kenziffer, jp.department,
                        ba.ba_name, bm.is_head  
                 FROM job_positions jp
                 JOIN ba_members bm ON jp.ba_id = bm.ba_id
                 JOIN berufungsausschuss ba ON jp.ba_id = ba.ba_id
                 WHERE bm.user_id = %s AND jp.status IN ('created', 'in_progress')
-            """, (user_id,))  
+            """
+
+# {before_live}/{before_archive} are empty or HISTORY_BEFORE_CONDITION (paging cursor)
+CHAT_HISTORY_QUERY = """
+                       SELECT cm.message_id, cm.sender_type, cm.message_text, cm.created_at
+                       FROM chat_sessions cs
+                       JOIN chat_messages cm ON cs.session_id = cm.session_id
+                       WHERE cs.user_id = %s and cs.position_id = %s {before_live}
+                       ORDER BY cm.created_at DESC, cm.message_id DESC
+                       LIMIT %s"""
+
+# Live and archived messages of a user's sessions for a position
+CHAT_HISTORY_WITH_ARCHIVE_QUERY = """
+                       SELECT history.message_id, history.sender_type, history.message_text, history.created_at
+                       FROM (
+                           SELECT cm.message_id, cm.sender_type, cm.message_text, cm.created_at
+                           FROM chat_sessions cs
+                           JOIN chat_messages cm ON cs.session_id = cm.session_id
+                           WHERE cs.user_id = %s and cs.position_id = %s {before_live}
+                           UNION ALL
+                           SELECT cma.message_id, cma.sender_type, cma.message_text, cma.created_at
+                           FROM chat_sessions cs
+                           JOIN chat_messages_archive cma ON cs.session_id = cma.session_id
+                           WHERE cs.user_id = %s and cs.position_id = %s {before_archive}
+                       ) history
+                       ORDER BY history.created_at DESC, history.message_id DESC
+                       LIMIT %s"""
+
+# Messages older than a (created_at, message_id) cursor; archived messages keep their message_id
+HISTORY_BEFORE_CONDITION = "AND ({alias}.created_at < %s OR ({alias}.created_at = %s AND {alias}.message_id < %s))"
+
+# Latest session of a user for a position that was active within the idle window
+REUSABLE_CHAT_SESSION_QUERY = """
+                       SELECT cs.session_id
+                       FROM chat_sessions cs
+                       WHERE cs.user_id = %s AND cs.position_id = %s
+                       AND COALESCE((SELECT MAX(cm.created_at) FROM chat_messages cm WHERE cm.session_id = cs.session_id),
+                                    cs.created_at) >= NOW() - INTERVAL %s MINUTE
+                       ORDER BY cs.session_id DESC
+                       LIMIT 1"""
+
+SHARED_PROGRESS_COUNT_QUERY = """
+                           SELECT COUNT(*) as count FROM ba_shared_progress
+                           WHERE position_id = %s
+                           """
+
+POSITION_TASKS_QUERY = """
+                           SELECT jp.ba_id, st.task_id
+                           FROM job_positions jp
+                           JOIN procedures p ON jp.procedure_id = p.procedure_id
+                           JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
+                           JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
+                           JOIN step_tasks st ON ps.step_id = st.step_id
+                           WHERE jp.position_id = %s
+                           """
+
+PROGRESS_VERSION_QUERY = """
+                           SELECT version FROM ba_progress_versions WHERE position_id = %s
+                           """
+
+# {placeholders} is filled with one %s per task id
+ROW_VERSIONS_QUERY = """
+                           SELECT task_id, row_version FROM ba_shared_progress
+                           WHERE position_id = %s AND task_id IN ({placeholders})
+                           FOR UPDATE
+                           """
+
+# Every upload is a new version of the task's document; numbering continues after deletes.
+# Run it after bump_progress_version() in the same transaction: the lock on the position's
+# ba_progress_versions row serializes concurrent uploads, so MAX(version) + 1 can't collide.
+INSERT_UPLOAD_VERSION_STATEMENT = """
+                           INSERT INTO document_uploads(
+                               user_id, position_id, task_id, version, original_filename, file_path)
+                           SELECT %s, %s, %s, COALESCE(MAX(version), 0) + 1, %s, %s
+                           FROM document_uploads
+                           WHERE position_id = %s AND task_id = %s
+                           """
+
+# Latest upload of every task of a position
+LATEST_UPLOADS_QUERY = """
+                           SELECT latest.task_id, latest.upload_id, latest.version, latest.original_filename,
+                                  latest.file_path, latest.username
+                           FROM (
+                               SELECT du.task_id, du.upload_id, du.version, du.original_filename, du.file_path, u.username,
+                                      ROW_NUMBER() OVER (PARTITION BY du.task_id ORDER BY du.upload_id DESC) AS rn
+                               FROM document_uploads du
+                               JOIN users u ON du.user_id = u.user_id
+                               WHERE du.position_id = %s AND du.deleted_at IS NULL
+                           ) latest
+                           WHERE latest.rn = 1
+                           """
+
+# Soft delete: the files are removed later by upload_utils.collect_document_garbage()
+SOFT_DELETE_UPLOAD_STATEMENT = """
+                               UPDATE document_uploads SET deleted_at = NOW()
+                               WHERE task_id=%s AND position_id = %s AND deleted_at IS NULL
+                               """
+
+
+@cached(tags=['positions', 'ba_groups'])
+def get_all_positions(user_id= None, user_type = None):
+    """
+    Fetches job positions based on user role.
+    HR sees all positions, BA only sees assigned positions
+    """
+    with get_db_cursor() as (conn, cursor):
+        if user_type == "HR":
+            cursor.execute(HR_POSITIONS_QUERY)
+        else:
+            cursor.execute(USER_POSITIONS_QUERY, (user_id,))  
              
         return cursor.fetchall()
     
@@ -34,51 +228,12 @@ def get_full_procedure_data(user_id: int, position_id: int):
     """
     Get comprehensive status information including current step & all related data.
     Returns everything needed for both chatbot response & interactive checklist. 
-    """
     
-    with get_db_cursor() as (conn, cursor):
-        # get all tasks with their progress for this position
-        query = """
-            SELECT
-                p.procedure_title,
-                p.grundlage,
-                ph.phase_id,
-                ph.phase_title,
-                ph.phase_order,
-                ph.link_url as phase_link,
-                ps.step_id,
-                ps.step_title,
-                ps.step_order,
-                ps.link_url as step_link,
-                st.task_id,
-                st.task_description,
-                st.task_order,
-                st.required_documents,
-                st.link_url as task_link,
-                COALESCE(up.status, 'not_started') as task_status,
-                up.completed_at
-                FROM job_positions jp
-                JOIN procedures p ON jp.procedure_id = p.procedure_id
-                JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
-                JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
-                JOIN step_tasks st ON ps.step_id = st.step_id
-                LEFT JOIN user_progress up ON st.task_id = up.task_id
-                AND up.position_id = jp.position_id
-                AND up.user_id = %s
-                WHERE jp.position_id = %s 
-                ORDER BY ph.phase_order, ps.step_order, st.task_order        
-        """ 
-        
-        cursor.execute(query, (user_id, position_id))  
-        all_tasks = cursor.fetchall()
-        
-        if not all_tasks:
-            return None
-        
-        #Analyze the data to get comprehensive status
-        status_data = analyze_user_progress(all_tasks) 
-        
-        return status_data
+    Progress is shared by the whole BA (ba_shared_progress is the single source of
+    truth), so this returns the shared data; the user is recorded per row as
+    completed_by_user_id / updated_by_user_id.
+    """
+    return get_shared_procedure_data(position_id)
        
 def analyze_user_progress(all_tasks):
     """
@@ -132,7 +287,8 @@ def analyze_user_progress(all_tasks):
             'task_link': task.get('task_link'),
             'task_status': task.get('task_status', 'not_started'),
             'completed_at': task.get('completed_at'),
-            'notes': task.get('notes')
+            'notes': task.get('notes'),
+            'row_version': task.get('row_version', 0)
             }
             
         all_steps[step_id]['tasks'].append(task_dict)
@@ -190,18 +346,9 @@ def analyze_user_progress(all_tasks):
 
 def update_task_status(user_id: int, position_id: int, task_id: int, new_status: str):
     """
-    Update the status of a specific task for a user
+    Update the status of a specific task, attributed to the user
     """
-    with get_db_cursor() as (conn, cursor):
-        query = """
-        INSERT INTO user_progress (user_id, position_id, task_id, status, completed_at)
-        VALUES (%s, %s, %s, %s, CASE WHEN %s = 'completed' THEN CURRENT_TIMESTAMP ELSE NULL END)
-        ON DUPLICATE KEY UPDATE status = VALUES(status), 
-        completed_at = VALUES(completed_at);
-        """ 
-        cursor.execute(query, (user_id, position_id, task_id, new_status, new_status))
-        conn.commit()
-        return True
+    return update_shared_task_status(position_id, task_id, new_status, user_id, None)
    
         
 def create_chat_session(user_id, position_id):
@@ -224,6 +371,47 @@ def create_chat_session(user_id, position_id):
         return cursor.lastrowid
    
 
+def get_or_create_chat_session(user_id, position_id, idle_minutes=CHAT_SESSION_IDLE_MINUTES):
+    """
+    Continues the user's chat session for the position if it was active within
+    idle_minutes, otherwise creates a new one. Call it when the first message
+    is saved, so that opening a position without chatting creates no session.
+    
+    param:
+        user_id(int): The ID of the user chatting
+        position_id(int): The ID of job position being discussed
+        idle_minutes(int): Maximum time since the last message to continue a session
+        
+    return:
+        int: session_id of the continued or new session
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute(REUSABLE_CHAT_SESSION_QUERY, (user_id, position_id, idle_minutes))
+        row = cursor.fetchone()
+        if row:
+            return row['session_id']
+    return create_chat_session(user_id, position_id)
+
+
+def prune_empty_chat_sessions(idle_minutes=CHAT_SESSION_IDLE_MINUTES):
+    """
+    Deletes sessions without live or archived messages that are older than the idle window
+    
+    return:
+        int: Number of deleted sessions
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute("""
+                       DELETE cs FROM chat_sessions cs
+                       WHERE cs.created_at < NOW() - INTERVAL %s MINUTE
+                       AND NOT EXISTS (SELECT 1 FROM chat_messages cm WHERE cm.session_id = cs.session_id)
+                       AND NOT EXISTS (SELECT 1 FROM chat_messages_archive cma WHERE cma.session_id = cs.session_id)
+                       """, (idle_minutes,))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+
+
 def save_chat_message(session_id, sender_type, message_text):
     """
     Sasves a chat message to the database for persistance and audit purpose.
@@ -234,36 +422,112 @@ def save_chat_message(session_id, sender_type, message_text):
         message_text(str): The message content to store
         
     return:
-        None
+        int: message_id of the saved message
     """
     with get_db_cursor() as (conn, cursor):
-        cursor.execute("""
-                       INSERT INTO chat_messages(session_id, sender_type, message_text)
-                       VALUES (%s, %s, %s)""", (session_id, sender_type, message_text))
+        message_id = execute_prepared(conn, INSERT_CHAT_MESSAGE, (session_id, sender_type, message_text)).lastrowid
         conn.commit()
+        return message_id
     
         
-def get_chat_history(user_id, position_id, limit=50):
+def get_chat_history(user_id, position_id, limit=50, include_archive=False, before=None):
     """
-    Retreives previous chat messages for a user and position to restore context.
+    Retreives previous chat messages for a user and position to restore context,
+    newest first. Pass the oldest message already shown as before to page further back.
     
     param:
         user_id(int): The ID of the user whose history to retrieve
         position_id(int): The ID  of the job postion to filter by 
         limit(int): Maximum messages to return(default: 50)
+        include_archive(bool): Also read messages moved to chat_messages_archive
+        before(tuple): Optional (created_at, message_id) cursor; only older messages are returned
+        
+    return:
+        list[dict]: messages with message_id, sender_type, message_text, created_at.
+    """
+    before_params = (before[0], before[0], before[1]) if before else ()
+    before_live = HISTORY_BEFORE_CONDITION.format(alias='cm') if before else ""
+    before_archive = HISTORY_BEFORE_CONDITION.format(alias='cma') if before else ""
+    
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        if include_archive:
+            cursor.execute(CHAT_HISTORY_WITH_ARCHIVE_QUERY.format(before_live=before_live, before_archive=before_archive),
+                           (user_id, position_id, *before_params, user_id, position_id, *before_params, limit))
+        else:
+            cursor.execute(CHAT_HISTORY_QUERY.format(before_live=before_live),
+                           (user_id, position_id, *before_params, limit))
+        return cursor.fetchall()
+
+
+def archive_chat_messages(months=CHAT_ARCHIVE_MONTHS, batch_size=5000):
+    """
+    Moves chat messages older than the given number of months to the compressed,
+    yearly partitioned chat_messages_archive, one transaction per batch.
+    
+    param:
+        months(int): Age in months from which messages are archived
+        batch_size(int): Messages moved per transaction
         
     return:
-        list[dict]: messages with sender_type, message_text, created_at.
+        int: Number of archived messages
     """
     with get_db_cursor() as (conn, cursor):
         cursor.execute("""
-                       SELECT cm.sender_type, cm.message_text, cm.created_at
-                       FROM chat_sessions cs
-                       JOIN chat_messages cm ON cs.session_id = cm.session_id
-                       WHERE cs.user_id = %s and cs.position_id = %s
-                       ORDER BY cm.created_at DESC
-                       LIMIT %s""", (user_id, position_id, limit))
-        return cursor.fetchall()
+                       SELECT DISTINCT YEAR(created_at) AS year FROM chat_messages
+                       WHERE created_at < NOW() - INTERVAL %s MONTH
+                       """, (months,))
+        ensure_archive_partitions(cursor, {row['year'] for row in cursor.fetchall()})
+    
+    archived = 0
+    while True:
+        with get_db_cursor() as (conn, cursor):
+            conn.start_transaction()
+            cursor.execute("""
+                           SELECT message_id FROM chat_messages
+                           WHERE created_at < NOW() - INTERVAL %s MONTH
+                           ORDER BY message_id
+                           LIMIT %s
+                           FOR UPDATE
+                           """, (months, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                return archived
+            
+            message_ids = [row['message_id'] for row in rows]
+            placeholders = ", ".join(["%s"] * len(message_ids))
+            cursor.execute(f"""
+                           INSERT IGNORE INTO chat_messages_archive (message_id, session_id, sender_type, message_text, created_at)
+                           SELECT message_id, session_id, sender_type, message_text, created_at
+                           FROM chat_messages WHERE message_id IN ({placeholders})
+                           """, tuple(message_ids))
+            cursor.execute(f"DELETE FROM chat_messages WHERE message_id IN ({placeholders})", tuple(message_ids))
+            conn.commit()
+            archived += len(message_ids)
+
+
+def ensure_archive_partitions(cursor, years):
+    """
+    Splits a yearly partition off the catch-all partition of chat_messages_archive
+    for every year that does not have one yet (ALTER TABLE commits implicitly,
+    so this runs before the archiving transactions).
+    """
+    cursor.execute("""
+                   SELECT partition_name AS partition_name FROM information_schema.partitions
+                   WHERE table_schema = DATABASE() AND table_name = 'chat_messages_archive'
+                   """)
+    existing = {row['partition_name'] for row in cursor.fetchall()}
+    first_year = min(int(name[1:]) for name in existing if name[1:].isdigit())
+    
+    for year in sorted(years):
+        if year < first_year or f"p{year}" in existing:
+            continue
+        cursor.execute(f"""
+                       ALTER TABLE chat_messages_archive REORGANIZE PARTITION pmax INTO (
+                           PARTITION p{year} VALUES LESS THAN ({year + 1}),
+                           PARTITION pmax VALUES LESS THAN MAXVALUE
+                       )""")
+        existing.add(f"p{year}")
     
 
 def initialize_shared_progress(position_id):
@@ -272,25 +536,14 @@ def initialize_shared_progress(position_id):
     try:
         with get_db_cursor() as (conn,cursor):
             # check if records already exist
-            cursor.execute("""
-                           SELECT COUNT(*) as count FROM ba_shared_progress
-                           WHERE position_id = %s
-                           """, (position_id,))
+            cursor.execute(SHARED_PROGRESS_COUNT_QUERY, (position_id,))
             
             result = cursor.fetchone()
             if result and result.get('count', 0) > 0:
                 return True  # Already initialized
             
             # Get ba_id and all tasks for this position
-            cursor.execute("""
-                           SELECT jp.ba_id, st.task_id
-                           FROM job_positions jp
-                           JOIN procedures p ON jp.procedure_id = p.procedure_id
-                           JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
-                           JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
-                           JOIN step_tasks st ON ps.step_id = st.step_id
-                           WHERE jp.position_id = %s
-                           """, (position_id,))
+            cursor.execute(POSITION_TASKS_QUERY, (position_id,))
         
         results = cursor.fetchall()
         if not results:
@@ -319,38 +572,7 @@ def get_shared_procedure_data(position_id):
     
     try:
         with get_db_cursor() as (conn, cursor):
-            query = """
-            SELECT p.procedure_title,
-                p.grundlage,
-                ph.phase_id,
-                ph.phase_title,
-                ph.phase_order,
-                ph.link_url as phase_link,
-                ps.step_id,
-                ps.step_title,
-                ps.step_order,
-                ps.link_url as step_link,
-                st.task_id,
-                st.task_description,
-                st.task_order,
-                st.required_documents,
-                st.link_url as task_link,
-                COALESCE(bsp.status, 'not_started') as task_status,
-                bsp.completed_at,
-                bsp.notes
-            FROM job_positions jp
-            JOIN procedures p ON jp.procedure_id = p.procedure_id
-            JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
-            JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
-            JOIN step_tasks st ON ps.step_id = st.step_id
-            LEFT JOIN ba_shared_progress bsp ON st.task_id = bsp.task_id AND bsp.position_id = jp.position_id
-            LEFT JOIN users u ON bsp.completed_by_user_id = u.user_id  
-            WHERE jp.position_id = %s 
-            ORDER BY ph.phase_order, ps.step_order, st.task_order 
-            """
-            
-            cursor.execute(query,(position_id,))
-            all_tasks = cursor.fetchall()
+            all_tasks = fetchall_dicts(execute_prepared(conn, SHARED_PROCEDURE_QUERY, (position_id,)))
             
             if not all_tasks:
                 return None
@@ -361,45 +583,48 @@ def get_shared_procedure_data(position_id):
         print(f"Error getting shared procedure data:{e}")
         return None
 
+def bump_progress_version(conn, position_id):
+    """ Marks the shared progress of a position as changed (call inside the updating transaction) """
+    execute_prepared(conn, BUMP_PROGRESS_VERSION, (position_id,))
+
+def get_progress_version(position_id):
+    """
+    Cheap change check for the shared checklist of a position.
+    
+    return:
+        int: Version counter, increased by every shared status update (0 if never updated)
+    """
+    try:
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute(PROGRESS_VERSION_QUERY, (position_id,))
+            row = cursor.fetchone()
+            return row['version'] if row else 0
+    except Exception as e:
+        print(f"Error getting progress version:{e}")
+        return None
+
 def update_shared_task_status(position_id, task_id, new_status, user_id, username, notes= None):
     """ Update shared task status"""
     
     try:
         with get_db_cursor() as (conn, cursor):
             # get the ba_id for this position
-            cursor.execute("""
-                           SELECT ba_id FROM job_positions WHERE position_id = %s
-                           """, (position_id,))
-            result = cursor.fetchone()
+            result = fetchone_dict(execute_prepared(conn, POSITION_BA_QUERY, (position_id,)))
             if not result:
                 print(f"No job position found for position_id:{position_id}")
                 return False
             
             ba_id = result.get('ba_id')
             
-            query = """
-            INSERT INTO ba_shared_progress(position_id, task_id, ba_id, status, completed_by_user_id, notes, completed_at)
-            VALUES (%s, %s, %s, %s, %s, %s, CASE WHEN %s = 'completed' THEN CURRENT_TIMESTAMP ELSE NULL END)
-            ON DUPLICATE KEY UPDATE 
-            status = VALUES(status),
-            completed_by_user_id = VALUES(completed_by_user_id),
-            notes = VALUES(notes),
-            completed_at = VALUES(completed_at)
-            """
-            cursor.execute(query, (position_id, task_id, ba_id, new_status, user_id, notes, new_status))
-                
-            cursor.execute("""
-            INSERT INTO user_progress (user_id, position_id, task_id, status, notes, completed_at)
-            VALUES (%s, %s, %s, %s, %s, CASE WHEN %s = 'completed' THEN CURRENT_TIMESTAMP ELSE NULL END)
-            ON DUPLICATE KEY UPDATE 
-            status = VALUES(status), 
-            notes = VALUES(notes),
-            completed_at = VALUES(completed_at)
-            """,(user_id, position_id, task_id, new_status, notes, new_status) )
+            # ba_shared_progress is the single source of truth for task progress
+            upsert = execute_prepared(conn, UPSERT_SHARED_PROGRESS,
+                                      (position_id, task_id, ba_id, new_status, user_id, user_id, notes, new_status))
+            rows_affected = upsert.rowcount
+            bump_progress_version(conn, position_id)
             
             conn.commit()
             
-            if cursor.rowcount == 0:
+            if rows_affected == 0:
                 print(f"No rows affected when updating task{task_id} for position {position_id}")
                 return False
             return True
@@ -409,47 +634,135 @@ def update_shared_task_status(position_id, task_id, new_status, user_id, usernam
         return False
 
 
+def update_shared_task_statuses(position_id, updates, user_id, expected_versions=None):
+    """
+    Applies several shared task status changes in one transaction.
+    Rows changed by someone else since they were loaded are rejected
+    (optimistic concurrency on ba_shared_progress.row_version).
+    
+    Args:
+        position_id: Id of the position
+        updates: list of (task_id, new_status, notes)
+        user_id: Id of the user making the changes
+        expected_versions: dict task_id -> row_version the user saw (None skips the check)
+        
+    Returns:
+        dict: success flag, updated and conflicting task ids, error message
+    """
+    expected_versions = expected_versions or {}
+    if not updates:
+        return {'success': True, 'updated': [], 'conflicts': [], 'error': None}
+    
+    try:
+        with get_db_cursor() as (conn, cursor):
+            conn.start_transaction()
+            
+            cursor.execute(POSITION_BA_QUERY, (position_id,))
+            result = cursor.fetchone()
+            if not result:
+                return {'success': False, 'updated': [], 'conflicts': [],
+                        'error': f"No job position found for position_id:{position_id}"}
+            ba_id = result.get('ba_id')
+            
+            # lock the affected rows and compare their versions
+            task_ids = [task_id for task_id, _, _ in updates]
+            placeholders = ", ".join(["%s"] * len(task_ids))
+            cursor.execute(ROW_VERSIONS_QUERY.format(placeholders=placeholders), (position_id, *task_ids))
+            current_versions = {row['task_id']: row['row_version'] for row in cursor.fetchall()}
+            
+            conflicts = [
+                task_id for task_id in task_ids
+                if task_id in expected_versions and current_versions.get(task_id, 0) != expected_versions[task_id]
+            ]
+            to_apply = [update for update in updates if update[0] not in conflicts]
+            
+            if to_apply:
+                cursor.executemany(UPSERT_SHARED_PROGRESS, [(position_id, task_id, ba_id, status, user_id, user_id, notes, status) for task_id, status, notes in to_apply])
+                
+                bump_progress_version(conn, position_id)
+            
+            conn.commit()
+            return {
+                'success': True,
+                'updated': [task_id for task_id, _, _ in to_apply],
+                'conflicts': conflicts,
+                'error': None
+            }
+        
+    except Exception as e:
+        print(f"Error updating shared task statuses:{e}")
+        return {'success': False, 'updated': [], 'conflicts': [], 'error': str(e)}
+
     
 def save_document_upload(user_id, position_id, task_id, uploaded_file):
     """
-    Save uploaded .txt document to file system and record in database
+    Save uploaded .txt document to file system and record it in the database
+    as the next version of the task's document (earlier versions are kept)
     
     Args:
         user_ID: ID of user uploading the document
         position_id: Id of the position
         task_id : Id of the task requiring the document
-        uploaded_file: Streamlit UploadeddFile object
+        uploaded_file: Spooled upload handle from upload_utils.spool_upload
+                       or a Streamlit UploadedFile object; text documents are
+                       stored compressed (see upload_utils.store_document)
     Returns:
         bool: True if successful, otherwise False 
         
     """
+    file_path = None
     try:
-        upload_dir = os.path.join("uploads", str(position_id), str(task_id))
+        upload_dir = os.path.join(UPLOAD_ROOT, str(position_id), str(task_id))
         os.makedirs(upload_dir, exist_ok = True)
         
         # Generate unique filename
+        original_filename = uploaded_file['name'] if isinstance(uploaded_file, dict) else uploaded_file.name
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{uploaded_file.name}"
+        filename = f"{timestamp}_{original_filename}"
         file_path = os.path.join(upload_dir, filename)
         
-        # Save file to disk
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Save file to disk (the path gets the suffix of the compression codec)
+        file_path = store_document(uploaded_file, file_path)
             
-        # Save record to database
+        # Save record to database; bump first so the version row lock is held for the insert
         with get_db_cursor() as (conn, cursor):
-            cursor.execute("""
-                           INSERT INTO document_uploads(
-                               user_id, position_id, task_id, original_filename, file_path)
-                               VALUES(%s, %s, %s, %s, %s)
-                            """, (user_id, position_id, task_id, uploaded_file.name, file_path))
+            bump_progress_version(conn, position_id)
+            cursor.execute(INSERT_UPLOAD_VERSION_STATEMENT,
+                           (user_id, position_id, task_id, original_filename, file_path, position_id, task_id))
             conn.commit()
             return True  
     
     except Exception as e:
         print(f"Error saving document: {e}")
+        # a file without row would only be found by the garbage collector
+        if file_path:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
         return False
 
+def get_uploaded_documents(position_id):
+    """
+    Latest uploaded document of every task of a position, in one query
+    
+    Args:
+        position_id: Id of the position
+        
+    Returns:
+        dict: task_id -> document information (tasks without upload are missing)
+    """
+    try:
+        # primary like get_shared_procedure_data: the page caches this map under the
+        # progress version, so a lagging replica would pin stale uploads to a new version
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute(LATEST_UPLOADS_QUERY, (position_id,))
+            return {row['task_id']: row for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error getting documents:{e}")
+        return {}
+
+
 def get_uploaded_document(task_id, position_id):
     """
     Get information about uploaded document for a task
@@ -464,25 +777,14 @@ def get_uploaded_document(task_id, position_id):
     
     try:
         with get_db_cursor()  as (conn, cursor):
-            cursor.execute("""
-                           SELECT du.upload_id,
-                           du.original_filename,
-                           du.file_path,
-                           u.username
-                           FROM document_uploads du
-                           JOIN users u ON du.user_id = u.user_id
-                           WHERE du.task_id = %s AND du.position_id = %s
-                           ORDER BY du.upload_id DESC
-                           LIMIT 1
-                           """, (task_id, position_id))
-            return cursor.fetchone()
+            return fetchone_dict(execute_prepared(conn, LATEST_UPLOAD_QUERY, (task_id, position_id)))
     except Exception as e:
         print(f"Error getting document:{e}")
         return None
 
 def read_uploaded_document(task_id, position_id):
     """
-    Read the content of an uploaded document
+    Read the content of an uploaded document, decompressing it if it was stored compressed
     
     Args:
         task_id: Id of the task
@@ -494,7 +796,7 @@ def read_uploaded_document(task_id, position_id):
     try:
         doc_info = get_uploaded_document(task_id,position_id)
         if doc_info and doc_info.get('file_path'):
-            with open(doc_info['file_path'], 'r', encoding = 'utf-8') as f:
+            with open_document_text(doc_info['file_path']) as f:
                 return f.read()
             return None
     except Exception as e:
@@ -502,27 +804,23 @@ def read_uploaded_document(task_id, position_id):
         return None
     
 def delete_uploaded_doc(task_id, position_id):
+    """
+    Soft deletes all versions of a task's document. The rows and files are kept
+    for DOCUMENT_RETENTION_DAYS and then removed by the document garbage collector.
+    
+    Args:
+        task_id: Id of the task
+        position_id: Id of the position
+        
+    Returns:
+        bool: True if a document was deleted, otherwise False
+    """
     try:
         with get_db_cursor() as (conn, cursor):
-            # get file path
-            cursor.execute("""
-                           SELECT file_path FROM document_uploads
-                           WHERE task_id = %s AND position_id = %s 
-                           """, (task_id, position_id))
-            row = cursor.fetchone()
-            
-            if row:
-                file_path = row['file_path']
-                
-                # delete file 
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    
-                # delete db record
-                cursor.execute("""
-                               DELETE FROM document_uploads
-                               WHERE task_id=%s AND position_id = %s
-                               """, (task_id, position_id))
+            cursor.execute(SOFT_DELETE_UPLOAD_STATEMENT, (task_id, position_id))
+            if cursor.rowcount > 0:
+                # uploads are cached with the checklist, so other members reload them
+                bump_progress_version(conn, position_id)
                 conn.commit()
                 return True
             return False
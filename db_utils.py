@@ -1,31 +1,281 @@
 import mysql.connector
-from urllib.parse import quote_plus
+from mysql.connector import pooling
 from dotenv import load_dotenv
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # maintenance scripts run without Streamlit
+    get_script_run_ctx = None
+
 load_dotenv()
 
+# Primary (read/write) database
+DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
+DB_PORT = int(os.getenv("DB_PORT", "3306"))
+DB_USER = os.getenv("DB_USER", "root")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
+# Server-side prepared statements kept per pooled connection
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "32"))
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+# Read replicas as comma separated host:port list, e.g. "127.0.0.1:3307"
+# (same user, password and database as the primary)
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+DB_REPLICA_MAX_LAG_SECONDS = int(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_SECONDS = int(os.getenv("DB_REPLICA_CHECK_SECONDS", "10"))
+
+# After a commit, reads of the same browser session stay on the primary for this long
+DB_READ_YOUR_WRITES_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+_replica_health = {}  # host -> (usable, checked_at)
+_local = threading.local()
+_primary_until = {}  # reader key (Streamlit session or thread) -> time until reads use the primary
+_primary_until_lock = threading.Lock()
+
+
+def _get_pool(host: str, port: int):
+    """ Returns the connection pool of a server, creating it on first use """
+    key = f"{host}:{port}"
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = pooling.MySQLConnectionPool(
+                pool_name=f"pool_{host}_{port}".replace('.', '_'),
+                pool_size=DB_POOL_SIZE,
+                # keep the session (and its prepared statements) when a connection returns to the pool;
+                # get_db_cursor rolls back open transactions instead
+                pool_reset_session=False,
+                host=host,
+                port=port,
+                user=DB_USER,
+                password=os.getenv("DB_PASSWORD"),
+                database=os.getenv("DB_NAME")
+            )
+        return _pools[key]
+
+
+def _connect(host: str, port: int):
+    """ Pooled connection, or a direct one if the pool is exhausted """
+    try:
+        return _get_pool(host, port).get_connection()
+    except mysql.connector.errors.PoolError:
+        return mysql.connector.connect(
+            host=host,
+            port=port,
+            user=DB_USER,
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME")
+        )
+
+
+def _split_host(replica: str):
+    host, _, port = replica.partition(":")
+    return host, int(port or 3306)
+
+
+def _replica_is_usable(conn, replica: str) -> bool:
+    """
+    Checks replication lag at most every DB_REPLICA_CHECK_SECONDS per replica.
+    A stopped replica (lag NULL) or one lagging more than DB_REPLICA_MAX_LAG_SECONDS is skipped.
+    """
+    usable, checked_at = _replica_health.get(replica, (True, 0))
+    if time.time() - checked_at < DB_REPLICA_CHECK_SECONDS:
+        return usable
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+        status = cursor.fetchone()
+        if status is None:
+            usable = True  # not configured as replica (e.g. a read-only copy)
+        else:
+            lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+            usable = lag is not None and lag <= DB_REPLICA_MAX_LAG_SECONDS
+    except mysql.connector.Error as e:
+        print(f"Replica lag check failed for {replica}: {e}")
+        usable = False
+    finally:
+        cursor.close()
+
+    if not usable:
+        print(f"Replica {replica} is lagging or unavailable, reading from primary")
+    _replica_health[replica] = (usable, time.time())
+    return usable
+
+
+def _get_replica_connection():
+    """ Connection to a healthy replica, or None if none is usable """
+    for replica in random.sample(DB_REPLICA_HOSTS, len(DB_REPLICA_HOSTS)):
+        usable, checked_at = _replica_health.get(replica, (True, 0))
+        if not usable and time.time() - checked_at < DB_REPLICA_CHECK_SECONDS:
+            continue
+        try:
+            conn = _connect(*_split_host(replica))
+        except mysql.connector.Error as e:
+            print(f"Replica {replica} unavailable: {e}")
+            _replica_health[replica] = (False, time.time())
+            continue
+        if _replica_is_usable(conn, replica):
+            return conn
+        conn.close()
+    return None
+
+
+def _reader_key():
+    """
+    Identifies who reads: the Streamlit session, because reruns and fragment runs
+    of one session don't stay on one thread; outside Streamlit the current thread.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    if ctx is not None:
+        return ('session', ctx.session_id)
+    return ('thread', threading.get_ident())
+
+
+def mark_primary_write():
+    """ Keeps the reads of this session (or thread) on the primary for DB_READ_YOUR_WRITES_SECONDS """
+    now = time.time()
+    with _primary_until_lock:
+        for key in [key for key, until in _primary_until.items() if until <= now]:
+            del _primary_until[key]
+        _primary_until[_reader_key()] = now + DB_READ_YOUR_WRITES_SECONDS
+
+
+@contextmanager
+def read_your_writes():
+    """ All reads of this thread inside the block are served by the primary """
+    _local.force_primary = getattr(_local, 'force_primary', 0) + 1
+    try:
+        yield
+    finally:
+        _local.force_primary -= 1
+
+
+def _use_primary_for_reads() -> bool:
+    if getattr(_local, 'force_primary', 0) > 0:
+        return True
+    with _primary_until_lock:
+        return time.time() < _primary_until.get(_reader_key(), 0)
+
+
+def get_db_connection(read_only = False):
+    """
+    Returns a database connection.
+    Read-only requests go to a replica when one is configured, healthy and
+    this session has not written recently; everything else uses the primary.
+    """
+    if read_only and DB_REPLICA_HOSTS and not _use_primary_for_reads():
+        conn = _get_replica_connection()
+        if conn is not None:
+            return conn
+    return _connect(DB_HOST, DB_PORT)
+
+
+class _WriteTrackingConnection:
+    """ Delegates to the real connection and records commits for read-your-writes routing """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        self._conn.commit()
+        mark_primary_write()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _raw_connection(conn):
+    """ Unwraps tracking and pool wrappers down to the physical connection """
+    conn = getattr(conn, '_conn', conn)
+    return getattr(conn, '_cnx', conn)
+
+
+def get_prepared_cursor(conn, sql: str):
+    """
+    Returns a server-side prepared cursor for sql, cached per physical connection.
+    The server parses the statement once per pooled connection; later calls only execute it.
+    """
+    raw = _raw_connection(conn)
+    cache = getattr(raw, '_statement_cache', None)
+    if cache is None:
+        cache = OrderedDict()
+        raw._statement_cache = cache
+
+    cursor = cache.get(sql)
+    if cursor is None:
+        cursor = raw.cursor(prepared=True)
+        cache[sql] = cursor
+        if len(cache) > DB_STATEMENT_CACHE_SIZE:
+            _, evicted = cache.popitem(last=False)
+            evicted.close()
+    else:
+        cache.move_to_end(sql)
+    return cursor
+
+
+def execute_prepared(conn, sql: str, params=()):
+    """
+    Executes sql as a cached prepared statement and returns its cursor.
+    If the server lost the statement (e.g. after a reconnect) it is prepared again.
+    """
+    cursor = get_prepared_cursor(conn, sql)
+    try:
+        cursor.execute(sql, params)
+    except mysql.connector.Error as e:
+        if e.errno != ER_UNKNOWN_STMT_HANDLER:
+            raise
+        _raw_connection(conn)._statement_cache.clear()
+        cursor = get_prepared_cursor(conn, sql)
+        cursor.execute(sql, params)
+    return cursor
+
+
+def fetchall_dicts(cursor):
+    """ Rows of a prepared cursor as dicts (prepared cursors return tuples) """
+    columns = cursor.column_names
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def fetchone_dict(cursor):
+    """ First row of a prepared cursor as dict, or None; always consumes the whole result """
+    rows = fetchall_dicts(cursor)
+    return rows[0] if rows else None
 
-def get_db_connection():
-    conn = mysql.connector.connect(
-        host = "127.0.0.1",
-        user = "root",
-        password = os.getenv("DB_PASSWORD"),
-        database = os.getenv("DB_NAME")
-    )
-    return conn
 
 @contextmanager
-def get_db_cursor(dictionary = True):
-    """Context manager for database operations"""
-    conn = get_db_connection()
+def get_db_cursor(dictionary = True, read_only = False):
+    """
+    Context manager for database operations
+
+    param:
+        dictionary(bool): Return rows as dicts
+        read_only(bool): The block only reads, so it may be served by a read replica
+    """
+    conn = get_db_connection(read_only=read_only)
     cursor = conn.cursor(dictionary=dictionary)
     try:
-        yield conn, cursor
+        yield _WriteTrackingConnection(conn), cursor
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        # pooled sessions are not reset, so don't hand back an open transaction/snapshot
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            pass
+        conn.close()
@@ -0,0 +1,29 @@
+# gc_uploads.py
+# Garbage collection of uploaded documents: soft deletes all but the newest
+# versions of every task document, removes versions deleted longer than the
+# retention period (row and file) and deletes files without a database row.
+# The app also runs this in the background every DOCUMENT_GC_INTERVAL_SECONDS.
+# Usage: python gc_uploads.py [--keep-versions 5] [--retention-days 30] [--batch-size 500]
+import argparse
+import sys
+from upload_utils import (collect_document_garbage, DOCUMENT_KEEP_VERSIONS, DOCUMENT_RETENTION_DAYS,
+                          DOCUMENT_GC_GRACE_SECONDS, DOCUMENT_GC_BATCH_SIZE)
+
+parser = argparse.ArgumentParser(description="Uploaded document garbage collection")
+parser.add_argument("--keep-versions", type=int, default=DOCUMENT_KEEP_VERSIONS, help="Versions kept per task document")
+parser.add_argument("--retention-days", type=int, default=DOCUMENT_RETENTION_DAYS,
+                    help="Days soft deleted versions are kept")
+parser.add_argument("--grace-seconds", type=int, default=DOCUMENT_GC_GRACE_SECONDS,
+                    help="Minimum age of a file without database row before it is deleted")
+parser.add_argument("--batch-size", type=int, default=DOCUMENT_GC_BATCH_SIZE, help="Rows or files per batch")
+args = parser.parse_args()
+
+result = collect_document_garbage(keep_versions=args.keep_versions, retention_days=args.retention_days,
+                                  grace_seconds=args.grace_seconds, batch_size=args.batch_size)
+if not result['success']:
+    print(result['error'])
+    sys.exit(1)
+
+print(f"Soft deleted {result['pruned']} old document versions")
+print(f"Purged {result['purged']} versions deleted more than {args.retention_days} days ago")
+print(f"Removed {result['orphans']} files without database row")
@@ -0,0 +1,540 @@
+# generate_dataset.py
+# Creates the full schema and fills it with synthetic data for scaling tests.
+# Meant for a scratch database: set DB_NAME accordingly before running.
+# Usage: python generate_dataset.py [--positions 10000] [--bas 500] [--user-progress 1000000]
+#                                   [--chat-messages 3000000] [--seed 42] [--reset]
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+import bcrypt
+from db_utils import get_db_cursor
+from migrations import apply_migrations
+
+# =============================================================================
+# BASE SCHEMA
+# State before migrations.py; the versioned migrations are applied on top.
+# =============================================================================
+
+BASE_TABLES = ['document_uploads', 'chat_messages', 'chat_sessions', 'user_progress', 'ba_shared_progress',
+               'job_positions', 'ba_members', 'berufungsausschuss', 'step_tasks', 'procedure_steps',
+               'procedure_phases', 'procedures', 'users']
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(100) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        user_type ENUM('HR', 'User') NOT NULL DEFAULT 'User',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS procedures (
+        procedure_id INT AUTO_INCREMENT PRIMARY KEY,
+        procedure_title VARCHAR(255) NOT NULL,
+        grundlage TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS procedure_phases (
+        phase_id INT AUTO_INCREMENT PRIMARY KEY,
+        procedure_id INT NOT NULL,
+        phase_title VARCHAR(255) NOT NULL,
+        phase_order INT NOT NULL,
+        link_url VARCHAR(500),
+        FOREIGN KEY (procedure_id) REFERENCES procedures(procedure_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS procedure_steps (
+        step_id INT AUTO_INCREMENT PRIMARY KEY,
+        phase_id INT NOT NULL,
+        step_title VARCHAR(255) NOT NULL,
+        step_order INT NOT NULL,
+        link_url VARCHAR(500),
+        FOREIGN KEY (phase_id) REFERENCES procedure_phases(phase_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS step_tasks (
+        task_id INT AUTO_INCREMENT PRIMARY KEY,
+        step_id INT NOT NULL,
+        task_description TEXT NOT NULL,
+        task_order INT NOT NULL,
+        required_documents TEXT,
+        link_url VARCHAR(500),
+        FOREIGN KEY (step_id) REFERENCES procedure_steps(step_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS berufungsausschuss (
+        ba_id INT AUTO_INCREMENT PRIMARY KEY,
+        ba_name VARCHAR(255) NOT NULL,
+        created_by INT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users(user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ba_members (
+        ba_id INT NOT NULL,
+        user_id INT NOT NULL,
+        is_head BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (ba_id, user_id),
+        FOREIGN KEY (ba_id) REFERENCES berufungsausschuss(ba_id),
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_positions (
+        position_id INT AUTO_INCREMENT PRIMARY KEY,
+        position_title VARCHAR(255) NOT NULL,
+        department VARCHAR(255),
+        kenziffer VARCHAR(50),
+        procedure_id INT NOT NULL,
+        created_by INT,
+        ba_id INT NULL,
+        status ENUM('created', 'in_progress', 'completed', 'cancelled') NOT NULL DEFAULT 'created',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (procedure_id) REFERENCES procedures(procedure_id),
+        FOREIGN KEY (created_by) REFERENCES users(user_id),
+        FOREIGN KEY (ba_id) REFERENCES berufungsausschuss(ba_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ba_shared_progress (
+        position_id INT NOT NULL,
+        task_id INT NOT NULL,
+        ba_id INT,
+        status ENUM('not_started', 'in_progress', 'completed') NOT NULL DEFAULT 'not_started',
+        completed_by_user_id INT NULL,
+        notes TEXT,
+        completed_at TIMESTAMP NULL,
+        PRIMARY KEY (position_id, task_id),
+        FOREIGN KEY (position_id) REFERENCES job_positions(position_id),
+        FOREIGN KEY (task_id) REFERENCES step_tasks(task_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_progress (
+        user_id INT NOT NULL,
+        position_id INT NOT NULL,
+        task_id INT NOT NULL,
+        status ENUM('not_started', 'in_progress', 'completed') NOT NULL DEFAULT 'not_started',
+        notes TEXT,
+        completed_at TIMESTAMP NULL,
+        PRIMARY KEY (user_id, position_id, task_id),
+        FOREIGN KEY (position_id) REFERENCES job_positions(position_id),
+        FOREIGN KEY (task_id) REFERENCES step_tasks(task_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        position_id INT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id),
+        FOREIGN KEY (position_id) REFERENCES job_positions(position_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        message_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        session_id INT NOT NULL,
+        sender_type ENUM('user', 'bot') NOT NULL,
+        message_text TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS document_uploads (
+        upload_id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        position_id INT NOT NULL,
+        task_id INT NOT NULL,
+        original_filename VARCHAR(255) NOT NULL,
+        file_path VARCHAR(500) NOT NULL,
+        uploaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id),
+        FOREIGN KEY (position_id) REFERENCES job_positions(position_id),
+        FOREIGN KEY (task_id) REFERENCES step_tasks(task_id)
+    )
+    """,
+    """
+    CREATE OR REPLACE VIEW full_procedure_view AS
+    SELECT p.procedure_id, p.procedure_title, p.grundlage,
+           ph.phase_id, ph.phase_title, ph.phase_order,
+           ps.step_id, ps.step_title, ps.step_order,
+           st.task_id, st.task_description, st.task_order, st.required_documents
+    FROM procedures p
+    JOIN procedure_phases ph ON p.procedure_id = ph.procedure_id
+    JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
+    JOIN step_tasks st ON ps.step_id = st.step_id
+    """,
+]
+
+# =============================================================================
+# VOCABULARY
+# =============================================================================
+
+DEPARTMENTS = ['Informatik', 'Mathematik', 'Physik', 'Chemie', 'Biologie', 'Medizin', 'Rechtswissenschaft',
+               'Wirtschaftswissenschaften', 'Geschichte', 'Philosophie', 'Psychologie', 'Maschinenbau',
+               'Elektrotechnik', 'Germanistik', 'Soziologie']
+PHASE_TITLES = ['Freigabe der Stelle', 'Ausschreibung', 'Bildung des Berufungsausschusses', 'Sichtung der Bewerbungen',
+                'Probevorträge', 'Auswahlgespräche', 'Externe Gutachten', 'Listenbeschluss', 'Fakultätsrat',
+                'Senat', 'Ruferteilung', 'Berufungsverhandlungen', 'Ernennung', 'Dokumentation', 'Abschluss']
+TASK_VERBS = ['Erstellen', 'Prüfen', 'Einholen', 'Versenden', 'Dokumentieren', 'Abstimmen', 'Freigeben',
+              'Einreichen', 'Bestätigen', 'Archivieren']
+TASK_OBJECTS = ['Ausschreibungstext', 'Gleichstellungsvotum', 'Gutachten', 'Bewerbungsunterlagen', 'Protokoll',
+                'Berufungsliste', 'Einladungen', 'Reisekostenabrechnung', 'Stellungnahme', 'Laudatio',
+                'Schwerbehindertenvertretung', 'Personalratsbeteiligung']
+DOCUMENTS = ['Protokoll', 'Gutachten', 'Lebenslauf', 'Publikationsliste', 'Lehrkonzept', 'Stellungnahme',
+             'Ausschreibungstext', 'Einverständniserklärung']
+USER_QUESTIONS = ['Was ist der nächste Schritt?', 'Welche Dokumente brauche ich für diese Aufgabe?',
+                  'Wie weit ist das Verfahren?', 'Wer ist im Berufungsausschuss?', 'help me with the current task',
+                  'Welche Aufgaben sind noch offen?', 'Wann müssen die Gutachten vorliegen?']
+BOT_ANSWERS = ['Der nächste Schritt ist die Einholung der externen Gutachten.',
+               'Für diese Aufgabe werden das Protokoll und die Stellungnahme benötigt.',
+               'Das Verfahren ist zu etwa der Hälfte abgeschlossen.',
+               'Der Ausschuss besteht aus sieben Mitgliedern, den Vorsitz hat die Dekanin.',
+               'Offen sind noch drei Aufgaben in der Phase Auswahlgespräche.']
+
+
+def insert_batches(cursor, conn, sql, rows, batch_size):
+    """
+    Inserts rows (any iterable) in multi-row batches, committing per batch.
+
+    return:
+        int: Number of rows inserted
+    """
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    return total
+
+
+def skewed_completion(rng):
+    """ Share of a position's tasks that are done: most positions early, few near the end """
+    return rng.betavariate(0.8, 1.8)
+
+
+def random_timestamp(rng, start, end):
+    return start + timedelta(seconds=rng.randint(0, int((end - start).total_seconds())))
+
+
+# =============================================================================
+# GENERATORS
+# =============================================================================
+
+def generate_procedures(rng, count):
+    """
+    Builds procedures of 5-15 phases, 2-6 steps per phase and 1-5 tasks per step.
+
+    return:
+        tuple: (procedure rows, phase rows, step rows, task rows, task ids per procedure in order)
+    """
+    procedures, phases, steps, tasks = [], [], [], []
+    tasks_by_procedure = {}
+    phase_id = step_id = task_id = 0
+
+    for procedure_id in range(1, count + 1):
+        procedures.append((procedure_id, f"Berufungsverfahren W{rng.choice([1, 2, 3])} Variante {procedure_id}",
+                           f"Berufungsordnung §{rng.randint(1, 40)}"))
+        task_ids = []
+        phase_titles = rng.sample(PHASE_TITLES, rng.randint(5, 15))
+        for phase_order, phase_title in enumerate(phase_titles, start=1):
+            phase_id += 1
+            phases.append((phase_id, procedure_id, phase_title, phase_order, None))
+            for step_order in range(1, rng.randint(2, 6) + 1):
+                step_id += 1
+                steps.append((step_id, phase_id, f"{phase_title}: Schritt {step_order}", step_order, None))
+                for task_order in range(1, rng.randint(1, 5) + 1):
+                    task_id += 1
+                    documents = ", ".join(rng.sample(DOCUMENTS, rng.randint(0, 3))) or None
+                    tasks.append((task_id, step_id,
+                                  f"{rng.choice(TASK_OBJECTS)} {rng.choice(TASK_VERBS).lower()}",
+                                  task_order, documents, None))
+                    task_ids.append(task_id)
+        tasks_by_procedure[procedure_id] = task_ids
+
+    return procedures, phases, steps, tasks, tasks_by_procedure
+
+
+def generate_committees(rng, ba_count, member_ids, hr_ids, now):
+    """
+    Committees of 4-9 members with exactly one head; some users sit on many committees.
+
+    return:
+        tuple: (committee rows, member rows, member ids per committee)
+    """
+    committees, members = [], []
+    members_by_ba = {}
+    # popular professors are picked more often (Zipf-like weights)
+    weights = [1 / (rank + 1) ** 0.6 for rank in range(len(member_ids))]
+
+    for ba_id in range(1, ba_count + 1):
+        committees.append((ba_id, f"BA {rng.choice(DEPARTMENTS)} {ba_id}", rng.choice(hr_ids),
+                           random_timestamp(rng, now - timedelta(days=1500), now)))
+        chosen = set()
+        size = rng.randint(4, 9)
+        while len(chosen) < size:
+            chosen.update(rng.choices(member_ids, weights=weights, k=size - len(chosen)))
+        chosen = list(chosen)
+        head = rng.choice(chosen)
+        members.extend((ba_id, user_id, user_id == head) for user_id in chosen)
+        members_by_ba[ba_id] = chosen
+
+    return committees, members, members_by_ba
+
+
+def generate_shared_progress(rng, positions, tasks_by_procedure, members_by_ba, now):
+    """ One row per task of every assigned position; tasks are completed in procedure order """
+    for position_id, procedure_id, ba_id, status, created_at in positions:
+        if ba_id is None:
+            continue
+        task_ids = tasks_by_procedure[procedure_id]
+        done = len(task_ids) if status == 'completed' else int(len(task_ids) * skewed_completion(rng))
+        completed_at = created_at
+        for index, task_id in enumerate(task_ids):
+            if index < done:
+                completed_at = min(now, completed_at + timedelta(hours=rng.expovariate(1 / 30)))
+                yield (position_id, task_id, ba_id, 'completed', rng.choice(members_by_ba[ba_id]), None, completed_at)
+            elif index == done and status != 'completed':
+                yield (position_id, task_id, ba_id, 'in_progress', None, None, None)
+            else:
+                yield (position_id, task_id, ba_id, 'not_started', None, None, None)
+
+
+def generate_user_progress(rng, target, positions, tasks_by_procedure, members_by_ba, now):
+    """ Personal progress rows of committee members, target rows spread over the assigned positions """
+    assigned = [position for position in positions if position[2] is not None]
+    per_position = max(1, math.ceil(target / max(1, len(assigned))))
+    produced = 0
+    for position_id, procedure_id, ba_id, status, created_at in assigned:
+        task_ids = tasks_by_procedure[procedure_id]
+        members = members_by_ba[ba_id]
+        done = len(task_ids) if status == 'completed' else int(len(task_ids) * skewed_completion(rng))
+        seen = set()
+        while len(seen) < min(per_position, len(task_ids) * len(members)):
+            if produced >= target:
+                return
+            key = (rng.choice(members), rng.choice(task_ids))
+            if key in seen:
+                continue
+            seen.add(key)
+            user_id, task_id = key
+            if task_ids.index(task_id) < done:
+                yield (user_id, position_id, task_id, 'completed', None, random_timestamp(rng, created_at, now))
+            else:
+                yield (user_id, position_id, task_id, rng.choice(['not_started', 'in_progress']), None, None)
+            produced += 1
+
+
+def generate_chat(rng, target_messages, positions, members_by_ba, now):
+    """
+    Bursty chat: each session has a few bursts (minutes apart inside, hours to days between),
+    and burst sizes are heavy-tailed, so a few sessions hold most messages.
+
+    yields:
+        ('session', row) and ('message', row) tuples in insert order
+    """
+    assigned = [position for position in positions if position[2] is not None]
+    produced = 0
+    session_id = 0
+    while produced < target_messages:
+        position_id, _, ba_id, _, created_at = rng.choice(assigned)
+        session_id += 1
+        user_id = rng.choice(members_by_ba[ba_id])
+        timestamp = random_timestamp(rng, created_at, now)
+        yield 'session', (session_id, user_id, position_id, timestamp)
+
+        for _ in range(1 + int(rng.expovariate(1 / 2))):
+            exchanges = min(200, max(1, int(rng.paretovariate(1.5))))
+            for _ in range(exchanges):
+                if produced >= target_messages:
+                    return
+                timestamp += timedelta(seconds=rng.randint(5, 90))
+                yield 'message', (session_id, 'user', rng.choice(USER_QUESTIONS), timestamp)
+                timestamp += timedelta(seconds=rng.randint(2, 20))
+                yield 'message', (session_id, 'bot', rng.choice(BOT_ANSWERS), timestamp)
+                produced += 2
+            timestamp += timedelta(hours=rng.expovariate(1 / 20))
+
+
+def generate_uploads(rng, count, positions, tasks_by_procedure, members_by_ba, now):
+    """ Uploads for tasks of assigned positions; files are not written to disk """
+    assigned = [position for position in positions if position[2] is not None]
+    versions = {}
+    for upload_id in range(1, count + 1):
+        position_id, procedure_id, ba_id, _, created_at = rng.choice(assigned)
+        task_id = rng.choice(tasks_by_procedure[procedure_id])
+        versions[position_id, task_id] = versions.get((position_id, task_id), 0) + 1
+        filename = f"{rng.choice(DOCUMENTS)}_{upload_id}.pdf"
+        yield (upload_id, rng.choice(members_by_ba[ba_id]), position_id, task_id, versions[position_id, task_id],
+               filename, f"uploads/generated/{position_id}/{filename}", random_timestamp(rng, created_at, now))
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic dataset generator for scaling tests")
+    parser.add_argument("--procedures", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5000, help="Committee members (HR users are added on top)")
+    parser.add_argument("--hr-users", type=int, default=50)
+    parser.add_argument("--bas", type=int, default=500, help="Berufungsausschüsse")
+    parser.add_argument("--positions", type=int, default=10000)
+    parser.add_argument("--user-progress", type=int, default=1000000, help="Rows in user_progress")
+    parser.add_argument("--chat-messages", type=int, default=3000000)
+    parser.add_argument("--uploads", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per multi-row INSERT")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="password", help="Password of every generated user")
+    parser.add_argument("--reset", action="store_true", help="Drop the existing tables first (destroys their data)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now().replace(microsecond=0)
+    started = time.time()
+
+    def step(name, count):
+        print(f"{name}: {count} rows ({time.time() - started:.0f}s)")
+
+    with get_db_cursor(dictionary=False) as (conn, cursor):
+        if args.reset:
+            # the pool keeps session settings (pool_reset_session=False), so always restore them
+            cursor.execute("SET foreign_key_checks = 0")
+            try:
+                cursor.execute("DROP VIEW IF EXISTS full_procedure_view")
+                for table in BASE_TABLES + ['chat_messages_archive', 'task_simplifications', 'ba_progress_versions',
+                                            'schema_migrations']:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            finally:
+                cursor.execute("SET foreign_key_checks = 1")
+
+        for statement in BASE_SCHEMA:
+            cursor.execute(statement)
+        conn.commit()
+
+    # migrations add the columns and indexes of the current schema
+    apply_migrations()
+
+    with get_db_cursor(dictionary=False) as (conn, cursor):
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] > 0:
+            print("The database already contains data; run with --reset on a scratch database.")
+            return
+
+        # bulk load: checks are redundant for generated keys (always restored below)
+        cursor.execute("SET foreign_key_checks = 0")
+        cursor.execute("SET unique_checks = 0")
+        try:
+            password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            user_count = args.hr_users + args.users
+            users = ((user_id, f"{'hr' if user_id <= args.hr_users else 'user'}{user_id}", password_hash,
+                      f"user{user_id}@example.org", 'HR' if user_id <= args.hr_users else 'User')
+                     for user_id in range(1, user_count + 1))
+            step("users", insert_batches(cursor, conn, """
+                INSERT INTO users (user_id, username, password_hash, email, user_type) VALUES (%s, %s, %s, %s, %s)
+                """, users, args.batch_size))
+            hr_ids = list(range(1, args.hr_users + 1))
+            member_ids = list(range(args.hr_users + 1, user_count + 1))
+
+            procedures, phases, steps, tasks, tasks_by_procedure = generate_procedures(rng, args.procedures)
+            insert_batches(cursor, conn, "INSERT INTO procedures (procedure_id, procedure_title, grundlage) VALUES (%s, %s, %s)",
+                           procedures, args.batch_size)
+            insert_batches(cursor, conn, """
+                INSERT INTO procedure_phases (phase_id, procedure_id, phase_title, phase_order, link_url) VALUES (%s, %s, %s, %s, %s)
+                """, phases, args.batch_size)
+            insert_batches(cursor, conn, """
+                INSERT INTO procedure_steps (step_id, phase_id, step_title, step_order, link_url) VALUES (%s, %s, %s, %s, %s)
+                """, steps, args.batch_size)
+            step("step_tasks", insert_batches(cursor, conn, """
+                INSERT INTO step_tasks (task_id, step_id, task_description, task_order, required_documents, link_url)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """, tasks, args.batch_size))
+
+            committees, members, members_by_ba = generate_committees(rng, args.bas, member_ids, hr_ids, now)
+            insert_batches(cursor, conn, "INSERT INTO berufungsausschuss (ba_id, ba_name, created_by, created_at) VALUES (%s, %s, %s, %s)",
+                           committees, args.batch_size)
+            step("ba_members", insert_batches(cursor, conn, "INSERT INTO ba_members (ba_id, user_id, is_head) VALUES (%s, %s, %s)",
+                                              members, args.batch_size))
+
+            # (position_id, procedure_id, ba_id, status, created_at); about 5% still without committee
+            positions = []
+            for position_id in range(1, args.positions + 1):
+                ba_id = rng.randint(1, args.bas) if rng.random() > 0.05 else None
+                status = 'created' if ba_id is None else rng.choices(['created', 'in_progress', 'completed'], [15, 65, 20])[0]
+                positions.append((position_id, rng.randint(1, args.procedures), ba_id, status,
+                                  random_timestamp(rng, now - timedelta(days=1200), now - timedelta(days=1))))
+            step("job_positions", insert_batches(cursor, conn, """
+                INSERT INTO job_positions (position_id, position_title, department, kenziffer, procedure_id, created_by, ba_id, status, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, ((position_id, f"W{rng.choice([2, 3])}-Professur {rng.choice(DEPARTMENTS)} {position_id}",
+                       rng.choice(DEPARTMENTS), f"K-{position_id:05d}", procedure_id, rng.choice(hr_ids), ba_id, status, created_at)
+                      for position_id, procedure_id, ba_id, status, created_at in positions), args.batch_size))
+
+            step("ba_shared_progress", insert_batches(cursor, conn, """
+                INSERT INTO ba_shared_progress (position_id, task_id, ba_id, status, completed_by_user_id, notes, completed_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, generate_shared_progress(rng, positions, tasks_by_procedure, members_by_ba, now), args.batch_size))
+            cursor.execute("UPDATE ba_shared_progress SET updated_by_user_id = completed_by_user_id")
+            conn.commit()
+
+            step("user_progress", insert_batches(cursor, conn, """
+                INSERT INTO user_progress (user_id, position_id, task_id, status, notes, completed_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """, generate_user_progress(rng, args.user_progress, positions, tasks_by_procedure, members_by_ba, now),
+                args.batch_size))
+
+            # sessions are flushed before their messages so every batch only references existing sessions
+            session_sql = "INSERT INTO chat_sessions (session_id, user_id, position_id, created_at) VALUES (%s, %s, %s, %s)"
+            message_sql = "INSERT INTO chat_messages (session_id, sender_type, message_text, created_at) VALUES (%s, %s, %s, %s)"
+            sessions, messages = [], []
+            session_total = message_total = 0
+            for kind, row in generate_chat(rng, args.chat_messages, positions, members_by_ba, now):
+                (sessions if kind == 'session' else messages).append(row)
+                if len(messages) >= args.batch_size:
+                    session_total += insert_batches(cursor, conn, session_sql, sessions, args.batch_size)
+                    message_total += insert_batches(cursor, conn, message_sql, messages, args.batch_size)
+                    sessions, messages = [], []
+            session_total += insert_batches(cursor, conn, session_sql, sessions, args.batch_size)
+            message_total += insert_batches(cursor, conn, message_sql, messages, args.batch_size)
+            step("chat_sessions", session_total)
+            step("chat_messages", message_total)
+
+            step("document_uploads", insert_batches(cursor, conn, """
+                INSERT INTO document_uploads (upload_id, user_id, position_id, task_id, version, original_filename, file_path,
+                                              uploaded_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, generate_uploads(rng, args.uploads, positions, tasks_by_procedure, members_by_ba, now), args.batch_size))
+        finally:
+            cursor.execute("SET unique_checks = 1")
+            cursor.execute("SET foreign_key_checks = 1")
+
+        for table in BASE_TABLES:
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+
+    print(f"Dataset generated in {time.time() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
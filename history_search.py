@@ -0,0 +1,145 @@
+import os
+import re
+import time
+from dotenv import load_dotenv
+from db_utils import get_db_cursor
+from procedure_search import STOPWORDS, fold_umlauts
+
+load_dotenv()
+
+# Results returned per source (chat messages, progress notes)
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "10"))
+
+# Characters of context shown around the first match
+SNIPPET_CHARS = 160
+
+# InnoDB does not index shorter words (innodb_ft_min_token_size)
+MIN_TERM_LENGTH = 3
+
+# =============================================================================
+# QUERIES
+# Backed by the FULLTEXT indexes of migration 8; module level so verify_indexes.py can EXPLAIN them
+# =============================================================================
+
+# Messages of the user's own chat sessions for a position
+CHAT_SEARCH_QUERY = """
+                    SELECT cm.message_id, cm.sender_type, cm.message_text, cm.created_at,
+                           MATCH(cm.message_text) AGAINST (%s IN BOOLEAN MODE) AS score
+                    FROM chat_messages cm
+                    JOIN chat_sessions cs ON cs.session_id = cm.session_id
+                    WHERE MATCH(cm.message_text) AGAINST (%s IN BOOLEAN MODE)
+                    AND cs.user_id = %s AND cs.position_id = %s
+                    ORDER BY score DESC, cm.created_at DESC
+                    LIMIT %s"""
+
+# Notes saved with the shared task progress of a position
+NOTES_SEARCH_QUERY = """
+                    SELECT bsp.task_id, st.task_description, bsp.notes, bsp.status, bsp.completed_at,
+                           u.username,
+                           MATCH(bsp.notes) AGAINST (%s IN BOOLEAN MODE) AS score
+                    FROM ba_shared_progress bsp
+                    JOIN step_tasks st ON st.task_id = bsp.task_id
+                    LEFT JOIN users u ON u.user_id = bsp.updated_by_user_id
+                    WHERE MATCH(bsp.notes) AGAINST (%s IN BOOLEAN MODE)
+                    AND bsp.position_id = %s
+                    ORDER BY score DESC
+                    LIMIT %s"""
+
+
+# Inflection endings cut from a search word, longest first. Only the end is cut: the
+# prefix query has to start like the indexed word, so no 'ge' strip or umlaut folding
+# (InnoDB compares with the column collation, which already ignores case and accents)
+SEARCH_SUFFIXES = ('ern', 'en', 'er', 'es', 'em', 'e', 'n', 's')
+
+# Shortest term left after cutting an ending
+MIN_STEM_LENGTH = 4
+
+
+def truncate_suffix(word):
+    """ Cuts one inflection ending, so 'Gutachten' becomes 'gutacht' and also finds 'Gutachter' """
+    for suffix in SEARCH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def build_search_terms(text: str):
+    """
+    Lowercases the words of a search text, cuts their inflection ending
+    and drops stopwords and words InnoDB does not index
+    """
+    words = re.findall(r"\w+", str(text or "").lower())
+    terms = []
+    for word in words:
+        if fold_umlauts(word) in STOPWORDS or len(word) < MIN_TERM_LENGTH:
+            continue
+        term = truncate_suffix(word)
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def to_boolean_query(terms):
+    """ Every term is required and matches as prefix, so 'Gutacht' finds 'Gutachten' and 'Gutachter' """
+    return " ".join(f"+{term}*" for term in terms)
+
+
+def _matches(word, terms):
+    # folded on both sides like the accent-insensitive collation, so 'Prufung' highlights 'Prüfung'
+    return fold_umlauts(word.lower()).startswith(tuple(fold_umlauts(term) for term in terms))
+
+
+def highlight_snippet(text, terms, width=SNIPPET_CHARS):
+    """
+    Cuts a snippet of width characters around the first matching word and marks
+    the matching words bold (Markdown)
+    """
+    text = " ".join(str(text or "").split())
+    first = next((match.start() for match in re.finditer(r"\w+", text) if _matches(match.group(0), terms)), 0)
+    start = max(0, first - width // 3)
+    end = min(len(text), start + width)
+
+    # escape Markdown in user text; the escapes never touch word characters
+    snippet = re.sub(r"([\\*_`#\[\]<>])", r"\\\1", text[start:end])
+    snippet = re.sub(r"\w+", lambda match: f"**{match.group(0)}**" if _matches(match.group(0), terms) else match.group(0),
+                     snippet)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+def search_history(user_id, position_id, text, limit=SEARCH_RESULT_LIMIT):
+    """
+    Full-text search over the user's chat messages and the shared progress notes of a position.
+    Messages moved to chat_messages_archive are not searched (partitioned tables have no FULLTEXT indexes).
+
+    param:
+        user_id(int): Searching user, only their own chat sessions are searched
+        position_id(int): Position the search is scoped to
+        text(str): Search words
+        limit(int): Maximum results per source
+
+    return:
+        dict: 'success', 'messages' and 'notes' (rows with a highlighted 'snippet'),
+              'elapsed_ms' and 'error'
+    """
+    terms = build_search_terms(text)
+    if not terms:
+        return {'success': True, 'messages': [], 'notes': [], 'elapsed_ms': 0.0, 'error': None}
+
+    query = to_boolean_query(terms)
+    started = time.perf_counter()
+    try:
+        with get_db_cursor(read_only=True) as (conn, cursor):
+            cursor.execute(CHAT_SEARCH_QUERY, (query, query, user_id, position_id, limit))
+            messages = cursor.fetchall()
+            cursor.execute(NOTES_SEARCH_QUERY, (query, query, position_id, limit))
+            notes = cursor.fetchall()
+    except Exception as e:
+        print(f"Error searching history: {e}")
+        return {'success': False, 'messages': [], 'notes': [], 'elapsed_ms': 0.0, 'error': str(e)}
+
+    for row in messages:
+        row['snippet'] = highlight_snippet(row['message_text'], terms)
+    for row in notes:
+        row['snippet'] = highlight_snippet(row['notes'], terms)
+    return {'success': True, 'messages': messages, 'notes': notes,
+            'elapsed_ms': (time.perf_counter() - started) * 1000, 'error': None}
@@ -1,18 +1,24 @@
+import csv
+import io
+import json
 from db_utils import get_db_cursor
+from cache_utils import cached, invalidate_tags
+
+# Rows per transaction when bulk importing positions
+IMPORT_CHUNK_SIZE = 50
+
+# Columns of a position import file; members/head are usernames
+IMPORT_FIELDS = ['position_title', 'department', 'kenziffer', 'procedure', 'ba_name', 'members', 'head']
+
+# MySQL error raised when an insert violates a unique key (e.g. uq_job_positions_kenziffer)
+ER_DUP_ENTRY = 1062
 
 # =============================================================================
-# JOB POSITION FUNCTIONS
+# QUERIES
+# Module level so verify_indexes.py can EXPLAIN them
 # =============================================================================
-def get_active_positions():
-    """
-    Gets all active positions with BA assignments and progress for Hr dashboard 
-    
-    return:
-        list[dict]: All positions with their BA and progress info.
-        """
-        
-    with get_db_cursor() as (conn, cursor):
-        query = """
+
+ACTIVE_POSITIONS_QUERY = """
         SELECT jp.position_id,
         jp.position_title,
         jp.department,
@@ -21,62 +27,118 @@ def get_active_positions():
         ba.ba_id,
         ba.ba_name,
         COUNT(DISTINCT st.task_id) as total_tasks,
-        COUNT(DISTINCT CASE WHEN up.status = 'completed' THEN up.task_id END) as completed_tasks
+        COUNT(DISTINCT CASE WHEN bsp.status = 'completed' THEN bsp.task_id END) as completed_tasks
         FROM job_positions jp
         LEFT JOIN berufungsausschuss ba ON jp.ba_id = ba.ba_id
         LEFT JOIN procedure_phases ph ON ph.procedure_id = jp.procedure_id
         LEFT JOIN procedure_steps ps ON ph.phase_id= ps.phase_id
         LEFT JOIN step_tasks st ON ps.step_id = st.step_id
-        LEFT JOIN user_progress up ON st.task_id = up.task_id AND up.position_id = jp.position_id
+        LEFT JOIN ba_shared_progress bsp ON st.task_id = bsp.task_id AND bsp.position_id = jp.position_id
         WHERE jp.status IN ('created', 'in_progress')
         GROUP BY jp.position_id, jp.position_title, jp.department, jp.kenziffer, jp.status, ba.ba_id, ba.ba_name
         ORDER BY  jp.position_id DESC
         """
-        
-        cursor.execute(query)
-        return cursor.fetchall()
-    
 
-
-
-def get_position_statistics():
-    """
-    Gets overall statistics for all postions for HR dashboard
-    
-    return:
-        dict: Statistics including counts and averages
-        """
-    try: 
-        with get_db_cursor() as (conn, cursor):   
-            # Get position counts
-            cursor.execute("""
+POSITION_COUNTS_QUERY = """
                        SELECT COUNT(*) as total_positions,
                        COUNT ( CASE WHEN ba_id IS NOT NULL THEN 1 END) as assigned_positions,
                        COUNT(CASE WHEN ba_id IS NULL THEN 1 END) as unassigned_positions,
                        COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_positions
                        FROM job_positions
                        WHERE status IN ('created', 'in_progress', 'completed')
-                       """)
-            counts = cursor.fetchone()
-        
-            #Get average progress
-            cursor.execute("""
+                       """
+
+AVERAGE_PROGRESS_QUERY = """
                        SELECT AVG(progress_percentage) as avg_progress
                        FROM (
                        SELECT jp.position_id,
                        CASE
                        WHEN COUNT(st.task_id) = 0 THEN 0
-                       ELSE (COUNT(CASE WHEN up.status = 'completed' THEN 1 END) * 100.0 / COUNT(st.task_id))
+                       ELSE (COUNT(CASE WHEN bsp.status = 'completed' THEN 1 END) * 100.0 / COUNT(st.task_id))
                        END as progress_percentage
                        FROM job_positions jp
                        LEFT JOIN procedure_phases ph ON ph.procedure_id = jp.procedure_id
                        LEFT JOIN procedure_steps ps ON ph.phase_id = ps.phase_id
                        LEFT JOIN step_tasks st ON ps.step_id = st.step_id
-                       LEFT JOIN user_progress up ON st.task_id = up.task_id AND up.position_id = jp.position_id
+                       LEFT JOIN ba_shared_progress bsp ON st.task_id = bsp.task_id AND bsp.position_id = jp.position_id
                        WHERE jp.status IN ('created', 'in_progress')
                        GROUP BY jp.position_id
                        ) as position_progress
-                       """)
+                       """
+
+BA_GROUPS_QUERY = """
+            SELECT 
+                ba.ba_id,
+                ba.ba_name,
+                ba.created_at,
+                COUNT(DISTINCT bm.user_id) as member_count,
+                COUNT(DISTINCT jp.position_id) as position_count
+            FROM berufungsausschuss ba
+            LEFT JOIN ba_members bm ON ba.ba_id = bm.ba_id
+            LEFT JOIN job_positions jp ON ba.ba_id = jp.ba_id
+            GROUP BY ba.ba_id
+            ORDER BY ba.created_at DESC
+        """
+
+BA_MEMBERS_QUERY = """
+            SELECT 
+                u.user_id,
+                u.username,
+                u.email,
+                bm.is_head
+            FROM ba_members bm
+            JOIN users u ON bm.user_id = u.user_id
+            WHERE bm.ba_id = %s
+            ORDER BY bm.is_head DESC, u.username
+        """
+
+AVAILABLE_USERS_QUERY = """
+                       SELECT user_id, username, email 
+                       FROM users
+                       WHERE user_type = 'User'
+                       ORDER BY username
+                       """
+
+PROCEDURES_QUERY = """
+                       SELECT procedure_id, procedure_title, grundlage
+                       FROM procedures
+                       ORDER BY procedure_title
+                       """
+
+
+# =============================================================================
+# JOB POSITION FUNCTIONS
+# =============================================================================
+def get_active_positions():
+    """
+    Gets all active positions with BA assignments and progress for Hr dashboard 
+    
+    return:
+        list[dict]: All positions with their BA and progress info.
+        """
+        
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        cursor.execute(ACTIVE_POSITIONS_QUERY)
+        return cursor.fetchall()
+    
+
+
+
+def get_position_statistics():
+    """
+    Gets overall statistics for all postions for HR dashboard
+    
+    return:
+        dict: Statistics including counts and averages
+        """
+    try: 
+        with get_db_cursor(read_only=True) as (conn, cursor):   
+            # Get position counts
+            cursor.execute(POSITION_COUNTS_QUERY)
+            counts = cursor.fetchone()
+        
+            #Get average progress
+            cursor.execute(AVERAGE_PROGRESS_QUERY)
             avg_result = cursor.fetchone()
         
             return{
@@ -102,6 +164,7 @@ def get_position_statistics():
 # BA COMITTEE FUNCTIONS
 # =============================================================================
 
+@cached(tags=['ba_groups', 'positions'])
 def get_all_ba_groups():
     """
     Gets all BA groups for HR dashboard.
@@ -109,37 +172,16 @@ def get_all_ba_groups():
     return:
         list[dict]: List of all BA groups with member counts.
     """
-    with get_db_cursor() as (conn, cursor):
-        cursor.execute("""
-            SELECT 
-                ba.ba_id,
-                ba.ba_name,
-                ba.created_at,
-                COUNT(DISTINCT bm.user_id) as member_count,
-                COUNT(DISTINCT jp.position_id) as position_count
-            FROM berufungsausschuss ba
-            LEFT JOIN ba_members bm ON ba.ba_id = bm.ba_id
-            LEFT JOIN job_positions jp ON ba.ba_id = jp.ba_id
-            GROUP BY ba.ba_id
-            ORDER BY ba.created_at DESC
-        """)
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        cursor.execute(BA_GROUPS_QUERY)
         return cursor.fetchall()
     
 
+@cached(tags=['ba_groups', 'users'])
 def get_ba_members(ba_id):
     """Get all members of a specific BA group"""
-    with get_db_cursor() as (conn, cursor):
-        cursor.execute("""
-            SELECT 
-                u.user_id,
-                u.username,
-                u.email,
-                bm.is_head
-            FROM ba_members bm
-            JOIN users u ON bm.user_id = u.user_id
-            WHERE bm.ba_id = %s
-            ORDER BY bm.is_head DESC, u.username
-        """, (ba_id,))
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        cursor.execute(BA_MEMBERS_QUERY, (ba_id,))
         return cursor.fetchall()
         
    
@@ -148,6 +190,7 @@ def get_ba_members(ba_id):
 # USER AND POSITION ASSIGNMENT FUNCTIONS
 # =============================================================================
 
+@cached(tags=['users'])
 def get_available_users_for_ba():
     """
     Gets all USER type users who can be assigned to a BA
@@ -156,13 +199,8 @@ def get_available_users_for_ba():
         list[dict]: List of users with id, username and email
     """
     
-    with get_db_cursor() as (conn, cursor):
-        cursor.execute("""
-                       SELECT user_id, username, email 
-                       FROM users
-                       WHERE user_type = 'User'
-                       ORDER BY username
-                       """)
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        cursor.execute(AVAILABLE_USERS_QUERY)
         return cursor.fetchall()
     
     
@@ -171,19 +209,21 @@ def get_available_users_for_ba():
 # CREATION FUNCTION
 # =============================================================================
 
+@cached(tags=['procedures'])
 def get_all_procedures():
     """
     Get all available procedure for job positions
     """
-    with get_db_cursor() as (conn, cursor):
-        cursor.execute("""
-                       SELECT procedure_id, procedure_title, grundlage
-                       FROM procedures
-                       ORDER BY procedure_title
-                       """)
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        cursor.execute(PROCEDURES_QUERY)
         return cursor.fetchall()
     
         
+def is_duplicate_kenziffer(error):
+    """ True if an insert failed on the unique key of job_positions.kenziffer """
+    return getattr(error, 'errno', None) == ER_DUP_ENTRY and 'kenziffer' in str(error)
+
+
 def create_ba_committee_with_position(position_title, department, kenziffer,procedure_id, created_by, ba_name, member_ids, head_id):
     """
     Creates a job position
@@ -215,6 +255,7 @@ def create_ba_committee_with_position(position_title, department, kenziffer,proc
         
             # Commit transaction
             conn.commit()
+            invalidate_tags('positions', 'ba_groups')
         
             return{
             'success': True,
@@ -223,7 +264,205 @@ def create_ba_committee_with_position(position_title, department, kenziffer,proc
             }
         
     except Exception as e:    
-        if "kenziffer" in str(e):
+        if is_duplicate_kenziffer(e):
             return {'success': False, 'error': 'Reference number (kenziffer) already exists'}
         else:
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+            return {'success': False, 'error': str(e)}
+
+
+# =============================================================================
+# BULK IMPORT FUNCTIONS
+# =============================================================================
+
+def parse_position_import(content, file_format):
+    """
+    Reads positions with their committee from a CSV or JSON import file.
+    CSV: one row per position, members separated by ';'.
+    JSON: a list of objects (or {"positions": [...]}), members as list or ';'-separated string.
+    Entries that are not objects are returned with an 'error' and reported by validate_position_import.
+    
+    param:
+        content(str|bytes): File content
+        file_format(str): 'csv' or 'json'
+        
+    return:
+        list[dict]: Rows with IMPORT_FIELDS as stripped strings, 'members' as list of
+                    usernames and 'row' as 1-based number of the entry in the file
+    
+    raises:
+        ValueError: Unsupported format or JSON that is not a list of positions
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    
+    if file_format == 'csv':
+        raw_rows = list(csv.DictReader(io.StringIO(content)))
+    elif file_format == 'json':
+        data = json.loads(content)
+        raw_rows = data.get('positions') if isinstance(data, dict) else data
+        if not isinstance(raw_rows, list):
+            raise ValueError('JSON import must be a list of positions or {"positions": [...]}')
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+    
+    rows = []
+    for number, raw in enumerate(raw_rows, start=1):
+        if not isinstance(raw, dict):
+            rows.append(dict({field: None for field in IMPORT_FIELDS}, members=[], row=number,
+                             error=f"entry is not an object (got {type(raw).__name__})"))
+            continue
+        
+        row = {field: raw.get(field) for field in IMPORT_FIELDS}
+        for field in IMPORT_FIELDS:
+            # JSON may hold numbers, e.g. a numeric kenziffer or head
+            if field != 'members' and row[field] is not None:
+                row[field] = str(row[field]).strip()
+        members = row['members'] or []
+        if isinstance(members, str):
+            members = members.split(';')
+        elif not isinstance(members, list):
+            members = [members]
+        row['members'] = list(dict.fromkeys(str(member).strip() for member in members if str(member).strip()))
+        row['row'] = number
+        rows.append(row)
+    return rows
+
+
+def validate_position_import(rows):
+    """
+    Checks import rows and resolves procedures and usernames (one query for all usernames).
+    
+    param:
+        rows(list[dict]): Rows from parse_position_import
+        
+    return:
+        tuple: (valid rows with procedure_id, member_ids and head_id added,
+                list of {'row', 'kenziffer', 'error'} for rejected rows)
+    """
+    procedures = get_all_procedures()
+    procedure_ids = {str(p['procedure_id']): p['procedure_id'] for p in procedures}
+    procedure_titles = {p['procedure_title'].lower(): p['procedure_id'] for p in procedures}
+    
+    usernames = {member for row in rows for member in row['members']} | {row['head'] for row in rows if row.get('head')}
+    kenziffers = [row['kenziffer'] for row in rows if row.get('kenziffer')]
+    
+    user_ids = {}
+    existing_kenziffers = set()
+    with get_db_cursor(read_only=True) as (conn, cursor):
+        if usernames:
+            placeholders = ", ".join(["%s"] * len(usernames))
+            cursor.execute(f"""
+                           SELECT user_id, username FROM users
+                           WHERE user_type = 'User' AND username IN ({placeholders})
+                           """, tuple(usernames))
+            user_ids = {user['username']: user['user_id'] for user in cursor.fetchall()}
+        if kenziffers:
+            placeholders = ", ".join(["%s"] * len(kenziffers))
+            cursor.execute(f"""
+                           SELECT kenziffer FROM job_positions WHERE kenziffer IN ({placeholders})
+                           """, tuple(kenziffers))
+            existing_kenziffers = {row['kenziffer'] for row in cursor.fetchall()}
+    
+    valid, errors = [], []
+    seen_kenziffers = set()
+    for row in rows:
+        if row.get('error'):
+            errors.append({'row': row['row'], 'kenziffer': None, 'error': row['error']})
+            continue
+        
+        problems = []
+        missing = [field for field in ['position_title', 'department', 'kenziffer', 'procedure', 'ba_name', 'head'] if not row.get(field)]
+        if missing:
+            problems.append(f"missing {', '.join(missing)}")
+        
+        procedure = str(row.get('procedure') or '')
+        procedure_id = procedure_ids.get(procedure) or procedure_titles.get(procedure.lower())
+        if procedure and procedure_id is None:
+            problems.append(f"unknown procedure '{procedure}'")
+        
+        if len(row['members']) < 2:
+            problems.append("at least 2 members required")
+        unknown = [member for member in row['members'] if member not in user_ids]
+        if unknown:
+            problems.append(f"unknown users: {', '.join(unknown)}")
+        if row.get('head') and row['head'] not in row['members']:
+            problems.append(f"head '{row['head']}' is not a member")
+        
+        kenziffer = row.get('kenziffer')
+        if kenziffer in existing_kenziffers:
+            problems.append('Reference number (kenziffer) already exists')
+        elif kenziffer in seen_kenziffers:
+            problems.append('Reference number (kenziffer) appears twice in the file')
+        if kenziffer:
+            seen_kenziffers.add(kenziffer)
+        
+        if problems:
+            errors.append({'row': row['row'], 'kenziffer': kenziffer, 'error': '; '.join(problems)})
+        else:
+            valid.append(dict(row, procedure_id=procedure_id,
+                              member_ids=[user_ids[member] for member in row['members']],
+                              head_id=user_ids[row['head']]))
+    return valid, errors
+
+
+def import_positions(rows, created_by, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Creates positions with their BA committee from validated import rows.
+    Rows are written in transactions of chunk_size rows; a failing row is rolled
+    back to its savepoint and reported without aborting the rest of the batch.
+    
+    param:
+        rows(list[dict]): Valid rows from validate_position_import
+        created_by(int): user_id of the importing HR user
+        chunk_size(int): Rows per transaction
+        
+    return:
+        dict: 'success', 'created' (row, kenziffer, position_id, ba_id) and 'errors' (row, kenziffer, error)
+    """
+    created, errors = [], []
+    
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with get_db_cursor() as (conn, cursor):
+                conn.start_transaction()
+                chunk_created = []
+                
+                for row in chunk:
+                    cursor.execute("SAVEPOINT import_row")
+                    try:
+                        cursor.execute("""
+                                       INSERT INTO berufungsausschuss (ba_name, created_by)
+                                       VALUES (%s, %s)""", (row['ba_name'], created_by))
+                        ba_id = cursor.lastrowid
+                        
+                        cursor.executemany("""
+                                           INSERT INTO ba_members(ba_id, user_id, is_head)
+                                           VALUES(%s, %s, %s)
+                                           """, [(ba_id, member_id, member_id == row['head_id']) for member_id in row['member_ids']])
+                        
+                        cursor.execute("""
+                                       INSERT INTO job_positions(position_title, department, kenziffer, procedure_id, created_by, ba_id, status)
+                                       VALUES(%s, %s, %s, %s, %s, %s,'created')
+                                       """, (row['position_title'], row['department'], row['kenziffer'],
+                                             row['procedure_id'], created_by, ba_id))
+                        chunk_created.append({'row': row['row'], 'kenziffer': row['kenziffer'],
+                                              'position_id': cursor.lastrowid, 'ba_id': ba_id})
+                        cursor.execute("RELEASE SAVEPOINT import_row")
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+                        # the unique key catches duplicates inserted after validation (concurrent imports)
+                        error = 'Reference number (kenziffer) already exists' if is_duplicate_kenziffer(e) else str(e)
+                        errors.append({'row': row['row'], 'kenziffer': row['kenziffer'], 'error': error})
+                
+                conn.commit()
+                created.extend(chunk_created)
+        except Exception as e:
+            print(f"Error importing positions: {e}")
+            errors.extend({'row': row['row'], 'kenziffer': row['kenziffer'], 'error': f"chunk rolled back: {e}"}
+                          for row in chunk if row['row'] not in {error['row'] for error in errors})
+    
+    if created:
+        invalidate_tags('positions', 'ba_groups')
+    
+    return {'success': not errors, 'created': created, 'errors': errors}
@@ -0,0 +1,44 @@
+# import_positions.py
+# Bulk creates job positions with their BA committee from a CSV or JSON file.
+# CSV columns: position_title,department,kenziffer,procedure,ba_name,members,head
+# (procedure as id or title, members as usernames separated by ';', head as username)
+# Usage: python import_positions.py positions.csv --created-by <hr username> [--chunk-size 50] [--dry-run]
+import argparse
+import os
+import sys
+from db_utils import get_db_cursor
+from hr_utils import parse_position_import, validate_position_import, import_positions, IMPORT_CHUNK_SIZE
+
+parser = argparse.ArgumentParser(description="Bulk import of positions and committees")
+parser.add_argument("file", help="CSV or JSON file")
+parser.add_argument("--created-by", required=True, help="Username of the HR user the positions are created by")
+parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+parser.add_argument("--dry-run", action="store_true", help="Only validate the file")
+args = parser.parse_args()
+
+with get_db_cursor() as (conn, cursor):
+    cursor.execute("SELECT user_id FROM users WHERE username = %s AND user_type = 'HR'", (args.created_by,))
+    hr_user = cursor.fetchone()
+if hr_user is None:
+    sys.exit(f"No HR user named '{args.created_by}'")
+
+file_format = 'json' if os.path.splitext(args.file)[1].lower() == '.json' else 'csv'
+with open(args.file, 'rb') as f:
+    try:
+        rows = parse_position_import(f.read(), file_format)
+    except ValueError as e:  # includes invalid JSON
+        sys.exit(f"Could not read {args.file}: {e}")
+
+valid, errors = validate_position_import(rows)
+print(f"{len(rows)} rows read, {len(valid)} valid, {len(errors)} rejected")
+
+if valid and not args.dry_run:
+    result = import_positions(valid, hr_user['user_id'], chunk_size=args.chunk_size)
+    errors.extend(result['errors'])
+    for position in result['created']:
+        print(f"row {position['row']}: created position #{position['position_id']} ({position['kenziffer']})")
+    print(f"{len(result['created'])} positions created")
+
+for error in sorted(errors, key=lambda e: e['row']):
+    print(f"row {error['row']} ({error['kenziffer'] or '-'}): {error['error']}")
+sys.exit(1 if errors else 0)
@@ -0,0 +1,248 @@
+from db_utils import get_db_cursor
+
+# =============================================================================
+# VERSIONED SCHEMA MIGRATIONS
+# Each entry is (version, description, statements). Applied versions are
+# recorded in schema_migrations, so running this module again is safe.
+# Run with: python migrations.py
+# A statement is either SQL or a callable that receives the cursor.
+# =============================================================================
+
+
+def ensure_index(table, index_name, columns):
+    """
+    Returns a migration step creating a composite index, unless the table
+    already has an index starting with the same columns (e.g. a unique key).
+    """
+    def step(cursor):
+        cursor.execute("""
+                       SELECT index_name AS index_name,
+                              GROUP_CONCAT(column_name ORDER BY seq_in_index) AS index_columns
+                       FROM information_schema.statistics
+                       WHERE table_schema = DATABASE() AND table_name = %s
+                       GROUP BY index_name
+                       """, (table,))
+        for row in cursor.fetchall():
+            if row['index_columns'].split(',')[:len(columns)] == columns:
+                print(f"{table}: index {row['index_name']} already covers ({', '.join(columns)})")
+                return
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+    return step
+
+
+def ensure_unique_key(table, index_name, columns):
+    """
+    Returns a migration step adding a unique key, unless the table already has a
+    unique index on exactly these columns. Fails with the duplicate values if
+    existing rows violate the key, so they can be cleaned up first.
+    """
+    def step(cursor):
+        cursor.execute("""
+                       SELECT index_name AS index_name,
+                              GROUP_CONCAT(column_name ORDER BY seq_in_index) AS index_columns
+                       FROM information_schema.statistics
+                       WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 0
+                       GROUP BY index_name
+                       """, (table,))
+        for row in cursor.fetchall():
+            if row['index_columns'].split(',') == columns:
+                print(f"{table}: unique index {row['index_name']} already covers ({', '.join(columns)})")
+                return
+
+        column_list = ', '.join(columns)
+        cursor.execute(f"""
+                       SELECT {column_list}, COUNT(*) AS duplicates FROM {table}
+                       WHERE {' AND '.join(f'{column} IS NOT NULL' for column in columns)}
+                       GROUP BY {column_list} HAVING COUNT(*) > 1
+                       LIMIT 20
+                       """)
+        duplicates = cursor.fetchall()
+        if duplicates:
+            raise RuntimeError(f"{table} has duplicate ({column_list}) values, resolve them before migrating: "
+                               f"{[tuple(row[column] for column in columns) for row in duplicates]}")
+        cursor.execute(f"ALTER TABLE {table} ADD UNIQUE KEY {index_name} ({column_list})")
+    return step
+
+
+MIGRATIONS = [
+    (1, "Store precomputed task simplifications", [
+        """
+        CREATE TABLE IF NOT EXISTS task_simplifications (
+            task_id INT NOT NULL PRIMARY KEY,
+            source_hash CHAR(64) NOT NULL,
+            prompt_hash CHAR(64) NOT NULL,
+            explanation MEDIUMTEXT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (2, "Track a progress version per position for change polling", [
+        """
+        CREATE TABLE IF NOT EXISTS ba_progress_versions (
+            position_id INT NOT NULL PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (3, "Add a row version to ba_shared_progress for optimistic concurrency", [
+        """
+        ALTER TABLE ba_shared_progress
+        ADD COLUMN row_version INT NOT NULL DEFAULT 0
+        """
+    ]),
+    (4, "Make ba_shared_progress the single source of task progress", [
+        """
+        ALTER TABLE ba_shared_progress
+        ADD COLUMN updated_by_user_id INT NULL,
+        ADD COLUMN updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """,
+        """
+        UPDATE ba_shared_progress
+        SET updated_by_user_id = completed_by_user_id
+        WHERE updated_by_user_id IS NULL
+        """,
+        # Backfill progress that was only recorded in user_progress, taking the
+        # latest completion per task; shared rows that were already started win.
+        # status is assigned last so the IF() checks above still see the old value.
+        """
+        INSERT INTO ba_shared_progress (position_id, task_id, ba_id, status, completed_by_user_id,
+                                        updated_by_user_id, notes, completed_at)
+        SELECT latest.position_id, latest.task_id, jp.ba_id, latest.status,
+               CASE WHEN latest.status = 'completed' THEN latest.user_id END,
+               latest.user_id, latest.notes, latest.completed_at
+        FROM (
+            SELECT up.*,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY up.position_id, up.task_id
+                       ORDER BY up.status = 'completed' DESC, up.completed_at DESC
+                   ) AS rn
+            FROM user_progress up
+        ) latest
+        JOIN job_positions jp ON jp.position_id = latest.position_id
+        WHERE latest.rn = 1
+        ON DUPLICATE KEY UPDATE
+        completed_by_user_id = IF(ba_shared_progress.status = 'not_started', VALUES(completed_by_user_id), ba_shared_progress.completed_by_user_id),
+        updated_by_user_id = IF(ba_shared_progress.status = 'not_started', VALUES(updated_by_user_id), ba_shared_progress.updated_by_user_id),
+        notes = IF(ba_shared_progress.status = 'not_started', VALUES(notes), ba_shared_progress.notes),
+        completed_at = IF(ba_shared_progress.status = 'not_started', VALUES(completed_at), ba_shared_progress.completed_at),
+        status = IF(ba_shared_progress.status = 'not_started', VALUES(status), ba_shared_progress.status)
+        """
+    ]),
+    (5, "Composite indexes for the hot query shapes", [
+        ensure_index('user_progress', 'idx_user_progress_position_user_task', ['position_id', 'user_id', 'task_id']),
+        ensure_index('ba_shared_progress', 'idx_ba_shared_progress_position_task', ['position_id', 'task_id']),
+        ensure_index('chat_messages', 'idx_chat_messages_session_created', ['session_id', 'created_at']),
+        ensure_index('chat_sessions', 'idx_chat_sessions_user_position', ['user_id', 'position_id']),
+        ensure_index('document_uploads', 'idx_document_uploads_task_position_upload', ['task_id', 'position_id', 'upload_id']),
+        ensure_index('ba_members', 'idx_ba_members_user_ba', ['user_id', 'ba_id']),
+    ]),
+    # Partitioned tables can't have foreign keys and need the partition column in every
+    # unique key. p2023 holds everything older; archive_chat_messages() splits new years off pmax.
+    (6, "Compressed, yearly partitioned archive for old chat messages", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_messages_archive (
+            message_id BIGINT NOT NULL,
+            session_id INT NOT NULL,
+            sender_type VARCHAR(10) NOT NULL,
+            message_text TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (message_id, created_at),
+            KEY idx_chat_messages_archive_session_created (session_id, created_at)
+        )
+        ROW_FORMAT=COMPRESSED
+        PARTITION BY RANGE (YEAR(created_at)) (
+            PARTITION p2023 VALUES LESS THAN (2024),
+            PARTITION p2024 VALUES LESS THAN (2025),
+            PARTITION p2025 VALUES LESS THAN (2026),
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+        """
+    ]),
+    # Existing uploads are numbered per task in upload order. deleted_at marks soft deleted
+    # versions; upload_utils.collect_document_garbage() removes them after the retention period.
+    (7, "Versioned document uploads with soft delete", [
+        """
+        ALTER TABLE document_uploads
+        ADD COLUMN version INT NOT NULL DEFAULT 1,
+        ADD COLUMN deleted_at DATETIME NULL
+        """,
+        """
+        UPDATE document_uploads du
+        JOIN (
+            SELECT upload_id,
+                   ROW_NUMBER() OVER (PARTITION BY position_id, task_id ORDER BY upload_id) AS rn
+            FROM document_uploads
+        ) numbered ON numbered.upload_id = du.upload_id
+        SET du.version = numbered.rn
+        """,
+        """
+        ALTER TABLE document_uploads
+        ADD UNIQUE KEY uq_document_uploads_position_task_version (position_id, task_id, version),
+        ADD KEY idx_document_uploads_deleted (deleted_at)
+        """
+    ]),
+    # The first FULLTEXT index of a table rebuilds it (hidden FTS_DOC_ID column); run off-peak on large data.
+    # chat_messages_archive is partitioned and can't have one, so archived messages are not searchable.
+    (8, "Full-text indexes for searching chat messages and progress notes", [
+        "ALTER TABLE chat_messages ADD FULLTEXT INDEX ft_chat_messages_text (message_text)",
+        "ALTER TABLE ba_shared_progress ADD FULLTEXT INDEX ft_ba_shared_progress_notes (notes)",
+    ]),
+    # Positions without kenziffer (NULL) are still allowed more than once
+    (9, "Unique reference number (kenziffer) per job position", [
+        ensure_unique_key('job_positions', 'uq_job_positions_kenziffer', ['kenziffer']),
+    ]),
+]
+
+
+def get_applied_versions(cursor):
+    """
+    Returns the set of migration versions already applied to the database
+    """
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS schema_migrations (
+                       version INT NOT NULL PRIMARY KEY,
+                       description VARCHAR(255) NOT NULL,
+                       applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                   )
+                   """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def apply_migrations():
+    """
+    Applies all pending migrations in version order.
+
+    return:
+        list[int]: Versions applied by this call
+    """
+    applied_now = []
+    with get_db_cursor() as (conn, cursor):
+        applied = get_applied_versions(cursor)
+
+        for version, description, statements in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+
+            for statement in statements:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            cursor.execute("""
+                           INSERT INTO schema_migrations (version, description)
+                           VALUES (%s, %s)
+                           """, (version, description))
+            conn.commit()
+
+            print(f"Applied migration {version}: {description}")
+            applied_now.append(version)
+
+    return applied_now
+
+
+if __name__ == "__main__":
+    applied_versions = apply_migrations()
+    if not applied_versions:
+        print("Database schema is up to date.")
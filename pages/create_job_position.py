@@ -7,18 +7,23 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from hr_utils import(
     create_ba_committee_with_position,
     get_available_users_for_ba,
-    get_all_procedures 
+    get_all_procedures,
+    parse_position_import,
+    validate_position_import,
+    import_positions
 )
+from session_utils import get_session_user
 
 st.set_page_config(page_title="Create new Job Position", layout="wide")
 
 #Authentication check
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+current_user = get_session_user(st.session_state.get("session_token"))
+if current_user is None:
     st.warning("Please login to view the page.")
     st.switch_page("app.py")
     st.stop()
     
-if st.session_state.current_user["user_type"] != "HR":
+if current_user["user_type"] != "HR":
     st.error("Access Denied. This page is only accessible for HR users.")
     st.stop()
     
@@ -91,6 +96,34 @@ if "position_created" in st.session_state and st.session_state.position_created:
             st.switch_page("pages/hr_dashboard.py")
     st.stop()
 
+# Bulk import of several positions at once
+with st.expander("Bulk import positions (CSV / JSON)"):
+    st.markdown("Columns: `position_title, department, kenziffer, procedure, ba_name, members, head` "
+                "- procedure as id or title, members as usernames separated by `;`, head as username.")
+    import_file = st.file_uploader("Import file", type=["csv", "json"], key="position_import_file")
+    
+    if import_file is not None:
+        try:
+            import_rows = parse_position_import(import_file.getvalue(), import_file.name.rsplit('.', 1)[-1].lower())
+            valid_rows, import_errors = validate_position_import(import_rows)
+        except Exception as e:
+            st.error(f"Could not read the file: {e}")
+            valid_rows, import_errors = [], []
+        
+        st.write(f"**{len(valid_rows)}** valid, **{len(import_errors)}** rejected")
+        if import_errors:
+            st.dataframe(import_errors, hide_index=True, use_container_width=True)
+        
+        if valid_rows and st.button(f"Import {len(valid_rows)} positions", type="primary"):
+            with st.spinner("Importing positions..."):
+                import_result = import_positions(valid_rows, current_user['user_id'])
+            if import_result['created']:
+                st.success(f"{len(import_result['created'])} positions created")
+                st.dataframe(import_result['created'], hide_index=True, use_container_width=True)
+            if import_result['errors']:
+                st.error(f"{len(import_result['errors'])} rows failed")
+                st.dataframe(import_result['errors'], hide_index=True, use_container_width=True)
+
 #form steps
 col1, col2 = st.columns(2)   
 
@@ -238,7 +271,7 @@ if st.session_state.form_step >= 2:
                             department=st.session_state.form_data['department'],
                             kenziffer=st.session_state.form_data['kenziffer'],
                             procedure_id=st.session_state.form_data['procedure_id'],
-                            created_by=st.session_state.current_user['user_id'],
+                            created_by=current_user['user_id'],
                             ba_name=st.session_state.form_data['ba_name'],
                             member_ids=selected_user_ids,
                             head_id=ba_head_id
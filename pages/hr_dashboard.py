@@ -10,18 +10,19 @@ from hr_utils import(
     get_position_statistics,
     get_all_ba_groups,
     get_ba_members)
+from session_utils import get_session_user, end_session
 
 # page configuration
 st.set_page_config(page_title = "HR Dashboard", layout = "wide")
 
 # authentication check
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+current_user = get_session_user(st.session_state.get("session_token"))
+if current_user is None:
     st.warning("Please log in to access this page.")
     st.switch_page("app.py")
     st.stop()
     
 # verify HR role
-current_user = st.session_state["current_user"]
 if current_user["user_type"] != "HR":
     st.error("Access Denied. This page is only accessible for HR users.")
     st.stop()
@@ -217,6 +218,6 @@ with st.sidebar:
 
     # Logout button
     if st.button("Logout", use_container_width=True):
-        st.session_state.logged_in = False
-        st.session_state.current_user = None
+        end_session(st.session_state.get("session_token"))
+        st.session_state.session_token = None
         st.switch_page("app.py")
\ No newline at end of file
@@ -0,0 +1,16 @@
+# precompute_simplifications.py
+# Batch job: stores simplified explanations for every task so that
+# "help me with the current task" is answered without a live LLM call.
+# Only tasks whose content or prompt version changed are regenerated.
+import argparse
+from chatbot_logic import precompute_task_simplifications, SIMPLIFICATION_MAX_CONCURRENCY
+
+parser = argparse.ArgumentParser(description="Precompute simplified task explanations")
+parser.add_argument("--concurrency", type=int, default=SIMPLIFICATION_MAX_CONCURRENCY,
+                    help="Maximum number of parallel LLM requests")
+parser.add_argument("--force", action="store_true", help="Regenerate all tasks")
+args = parser.parse_args()
+
+summary = precompute_task_simplifications(max_concurrency=args.concurrency, force=args.force)
+print(f"Done: {summary['regenerated']} regenerated, {summary['skipped']} up to date, "
+      f"{summary['failed']} failed ({summary['total']} tasks)")
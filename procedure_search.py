@@ -0,0 +1,253 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+from db_utils import get_db_cursor
+
+load_dotenv()
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# How often the index is compared against full_procedure_view (seconds)
+PROCEDURE_INDEX_REFRESH_SECONDS = int(os.getenv("PROCEDURE_INDEX_REFRESH_SECONDS", "300"))
+
+# Wait after a failed refresh before the view is read again (seconds)
+PROCEDURE_INDEX_RETRY_SECONDS = int(os.getenv("PROCEDURE_INDEX_RETRY_SECONDS", "30"))
+
+# Fields of full_procedure_view that are indexed per task
+INDEXED_FIELDS = ['procedure_title', 'phase_title', 'step_title', 'task_description', 'required_documents']
+
+# Common German and English words that carry no meaning for retrieval
+STOPWORDS = {
+    'der', 'die', 'das', 'den', 'dem', 'des', 'ein', 'eine', 'einen', 'einem', 'einer', 'eines',
+    'und', 'oder', 'aber', 'mit', 'von', 'zu', 'zur', 'zum', 'im', 'in', 'an', 'am', 'auf', 'aus',
+    'bei', 'fur', 'uber', 'nach', 'vor', 'ist', 'sind', 'wird', 'werden', 'wurde', 'ich', 'wir', 'sie',
+    'es', 'er', 'was', 'wie', 'wer', 'wo', 'welche', 'welcher', 'welches', 'muss', 'mussen', 'soll',
+    'kann', 'nicht', 'auch', 'als', 'sich', 'so', 'noch', 'nur', 'alle', 'bitte',
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'for', 'in', 'on', 'at', 'by', 'with', 'is', 'are',
+    'be', 'do', 'does', 'what', 'which', 'who', 'how', 'when', 'where', 'i', 'we', 'my', 'our', 'me',
+    'need', 'needed', 'have', 'has', 'can', 'should', 'must', 'about', 'there', 'this', 'that', 'it'
+}
+
+
+def fold_umlauts(word: str) -> str:
+    """ Maps umlauts and ß to their base letters so 'Prüfung' and 'Prufung' match """
+    return word.replace('ä', 'a').replace('ö', 'o').replace('ü', 'u').replace('ß', 'ss')
+
+
+def stem_german(word: str) -> str:
+    """
+    Light German stemmer (CISTEM rules): strips plural and inflection suffixes
+    so that e.g. 'Gutachten', 'Gutachtens' and 'Unterlagen'/'Unterlage' share a stem.
+    """
+    word = fold_umlauts(word)
+    if word.startswith('ge') and len(word) >= 6:
+        word = word[2:]
+
+    # Protect letter groups that must not be cut by the suffix rules
+    word = word.replace('sch', '$').replace('ei', '%').replace('ie', '&')
+    word = re.sub(r"(.)\1", r"\1*", word)
+
+    while len(word) > 3:
+        if len(word) > 5 and word[-2:] in ('em', 'er', 'nd'):
+            word = word[:-2]
+        elif word[-1] in ('t', 'e', 's', 'n'):
+            word = word[:-1]
+        else:
+            break
+
+    word = re.sub(r"(.)\*", r"\1\1", word)
+    return word.replace('$', 'sch').replace('%', 'ei').replace('&', 'ie')
+
+
+def tokenize(text: str):
+    """
+    Splits German/English text into stemmed index terms without stopwords
+    """
+    if not text:
+        return []
+    words = re.findall(r"\w+", str(text).lower())
+    return [stem_german(word) for word in words if fold_umlauts(word) not in STOPWORDS and len(word) > 1]
+
+
+class ProcedureIndex:
+    """
+    In-process BM25 inverted index over procedure tasks.
+    Documents can be added, replaced and removed individually, so the
+    index is kept up to date incrementally instead of being rebuilt.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}       # term -> {task_id: term frequency}
+        self._doc_lengths = {}    # task_id -> number of terms
+        self._documents = {}      # task_id -> indexed row
+        self._total_length = 0
+        self.last_refresh = 0.0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add_document(self, task_id, row: dict):
+        """ Indexes a task, replacing an older version of it """
+        terms = Counter()
+        for field in INDEXED_FIELDS:
+            terms.update(tokenize(row.get(field)))
+
+        with self._lock:
+            self.remove_document(task_id)
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[task_id] = frequency
+            length = sum(terms.values())
+            self._doc_lengths[task_id] = length
+            self._documents[task_id] = row
+            self._total_length += length
+
+    def remove_document(self, task_id):
+        """ Removes a task from the index if present """
+        with self._lock:
+            row = self._documents.pop(task_id, None)
+            if row is None:
+                return
+            for field in INDEXED_FIELDS:
+                for term in set(tokenize(row.get(field))):
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(task_id, None)
+                        if not postings:
+                            del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(task_id, 0)
+
+    def sync(self, rows_by_task: dict) -> dict:
+        """
+        Brings the index in line with the given rows, touching only tasks that changed.
+
+        return:
+            dict: Counts of added/updated and removed tasks
+        """
+        with self._lock:
+            changed = [task_id for task_id, row in rows_by_task.items() if self._documents.get(task_id) != row]
+            removed = [task_id for task_id in self._documents if task_id not in rows_by_task]
+
+            for task_id in changed:
+                self.add_document(task_id, rows_by_task[task_id])
+            for task_id in removed:
+                self.remove_document(task_id)
+
+            self.last_refresh = time.time()
+        return {'updated': len(changed), 'removed': len(removed)}
+
+    def search(self, query: str, top_k: int = 5):
+        """
+        Ranks tasks by BM25 relevance to the query.
+
+        return:
+            list[dict]: Indexed task rows with 'score' and 'coverage'
+                        (share of query terms found in the task), best first
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self._documents)
+            if doc_count == 0:
+                return []
+            average_length = self._total_length / doc_count
+
+            scores = Counter()
+            matched_terms = Counter()
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for task_id, frequency in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self._doc_lengths[task_id] / average_length
+                    scores[task_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                    matched_terms[task_id] += 1
+
+            return [
+                dict(self._documents[task_id], score=score, coverage=matched_terms[task_id] / len(query_terms))
+                for task_id, score in scores.most_common(top_k)
+            ]
+
+
+def load_procedure_rows():
+    """
+    Reads all tasks from full_procedure_view
+
+    return:
+        dict: task_id -> row with the indexed fields
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute("SELECT * FROM full_procedure_view")
+        rows = cursor.fetchall()
+
+    rows_by_task = {}
+    for row in rows:
+        task_id = row.get('task_id')
+        if task_id is None:
+            continue
+        rows_by_task[task_id] = {
+            'task_id': task_id,
+            **{field: row.get(field) for field in INDEXED_FIELDS}
+        }
+    return rows_by_task
+
+
+_procedure_index = ProcedureIndex()
+_procedure_index_lock = threading.Lock()
+_last_refresh_attempt = 0.0
+
+
+def _sync_procedure_index() -> dict:
+    """ Refresh body; the caller holds _procedure_index_lock """
+    result = _procedure_index.sync(load_procedure_rows())
+    print(f"Procedure index refreshed: {result['updated']} updated, {result['removed']} removed, "
+          f"{len(_procedure_index)} tasks indexed")
+    return result
+
+
+def refresh_procedure_index() -> dict:
+    """
+    Re-reads full_procedure_view and updates only the tasks that changed
+    """
+    with _procedure_index_lock:
+        return _sync_procedure_index()
+
+
+def _refresh_due() -> bool:
+    now = time.time()
+    return (now - _procedure_index.last_refresh > PROCEDURE_INDEX_REFRESH_SECONDS
+            and now - _last_refresh_attempt > PROCEDURE_INDEX_RETRY_SECONDS)
+
+
+def get_procedure_index() -> ProcedureIndex:
+    """
+    Returns the shared procedure index, building it on first use and
+    refreshing it incrementally every PROCEDURE_INDEX_REFRESH_SECONDS.
+    After a failed refresh the view is read again only after PROCEDURE_INDEX_RETRY_SECONDS.
+    """
+    global _last_refresh_attempt
+    if not _refresh_due():
+        return _procedure_index
+
+    # a built index keeps serving while another rerun refreshes it;
+    # only the first build makes concurrent reruns wait for it
+    if not _procedure_index_lock.acquire(blocking=not len(_procedure_index)):
+        return _procedure_index
+    try:
+        if _refresh_due():
+            _last_refresh_attempt = time.time()
+            _sync_procedure_index()
+    except Exception as e:
+        print(f"Error refreshing procedure index: {e}")
+    finally:
+        _procedure_index_lock.release()
+    return _procedure_index
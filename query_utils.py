@@ -0,0 +1,385 @@
+import os
+import re
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+
+# Guardrails for SQL written by the LLM (configurable via .env)
+SQL_ROW_LIMIT = int(os.getenv("SQL_ROW_LIMIT", "200"))
+SQL_MAX_EXECUTION_MS = int(os.getenv("SQL_MAX_EXECUTION_MS", "5000"))
+SQL_MAX_ESTIMATED_ROWS = int(os.getenv("SQL_MAX_ESTIMATED_ROWS", "100000"))
+
+# Upper bound for the result rows shown to the answer prompt; the rest is summarized
+SQL_RESULT_TOKEN_BUDGET = int(os.getenv("SQL_RESULT_TOKEN_BUDGET", "1500"))
+FETCH_BATCH_SIZE = 50
+MAX_DISTINCT_VALUES = 10
+MAX_SUMMARY_VALUE_CHARS = 60
+
+# Keywords that must never appear in a generated query, even inside a SELECT
+# (MySQL allows WITH ... UPDATE/DELETE, so checking the first keyword is not enough)
+FORBIDDEN_KEYWORDS = [
+    'update', 'delete', 'drop', 'alter', 'create', 'truncate', 'rename', 'grant', 'revoke',
+    'lock', 'unlock', 'call', 'handler', 'outfile', 'dumpfile'
+]
+
+# Results small and regular enough to be rendered directly, without the answer LLM
+DIRECT_ANSWER_MAX_ROWS = int(os.getenv("DIRECT_ANSWER_MAX_ROWS", "15"))
+DIRECT_ANSWER_MAX_COLUMNS = int(os.getenv("DIRECT_ANSWER_MAX_COLUMNS", "4"))
+DIRECT_ANSWER_MAX_CELL_CHARS = 200
+
+# How often the answer LLM was skipped ('direct') or used ('llm')
+_answer_mode_counts = {'direct': 0, 'llm': 0}
+_answer_mode_lock = threading.Lock()
+
+# MySQL error raised when MAX_EXECUTION_TIME interrupts a statement
+MAX_EXECUTION_TIME_ERRNO = 3024
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (about 4 characters per token) used for prompt size budgeting
+    """
+    return len(text) // 4
+
+
+def clean_sql(sql: str) -> str:
+    """
+    Strips markdown fences, surrounding whitespace and trailing semicolons from LLM output
+    """
+    sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE).strip()
+    return sql.rstrip(";").strip()
+
+
+def check_select_only(sql: str):
+    """
+    Checks that the query is a single read-only SELECT statement.
+
+    Returns:
+        str: Reason for rejection, or None if the query is allowed
+    """
+    # Ignore keywords inside string literals and comments
+    stripped = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", "''", sql)
+    stripped = re.sub(r"/\*.*?\*/|--[^\n]*|#[^\n]*", " ", stripped, flags=re.DOTALL).lower()
+
+    if not stripped.strip():
+        return "The query is empty."
+    if ";" in stripped:
+        return "Only a single statement is allowed."
+    if not re.match(r"\s*(select|with)\b", stripped):
+        return "Only SELECT statements are allowed."
+
+    words = set(re.findall(r"\w+", stripped))
+    forbidden = [keyword for keyword in FORBIDDEN_KEYWORDS if keyword in words]
+    if forbidden:
+        return f"The query contains forbidden keywords: {', '.join(forbidden)}."
+    if re.search(r"\bfor\s+(update|share)\b", stripped):
+        return "Locking reads are not allowed."
+
+    return None
+
+
+def apply_row_limit(sql: str, max_rows: int = SQL_ROW_LIMIT) -> str:
+    """
+    Adds a LIMIT to the query, or clamps an existing trailing LIMIT to max_rows
+    """
+    match = re.search(r"\blimit\s+(\d+)\s*(?:,\s*(\d+))?(\s+offset\s+\d+)?\s*$", sql, flags=re.IGNORECASE)
+    if not match:
+        return f"{sql}\nLIMIT {max_rows}"
+
+    if match.group(2):
+        # LIMIT offset, count
+        offset, count = int(match.group(1)), int(match.group(2))
+        return f"{sql[:match.start()]}LIMIT {offset}, {min(count, max_rows)}"
+
+    count = int(match.group(1))
+    return f"{sql[:match.start()]}LIMIT {min(count, max_rows)}{match.group(3) or ''}"
+
+
+def estimate_plan_rows(explain_rows) -> int:
+    """
+    Estimates how many rows a plan touches from EXPLAIN output.
+    Tables joined within one SELECT (same id) multiply, so their product of rows * filtered%
+    is used; separate SELECTs (UNION branches, subqueries) are added up.
+    """
+    per_select = {}
+    for row in explain_rows:
+        # the UNION RESULT row (id NULL) only reads the temporary table of the branches
+        if row.get('id') is None:
+            continue
+        rows = row.get('rows') or 1
+        filtered = row.get('filtered')
+        filtered = float(filtered) if filtered is not None else 100.0
+        per_select[row['id']] = per_select.get(row['id'], 1.0) * max(float(rows) * filtered / 100, 1)
+    return int(sum(per_select.values())) if per_select else 1
+
+
+def rejected(reason: str, message: str, sql: str) -> dict:
+    """ Structured rejection that the answer prompt can explain to the user """
+    return {
+        'status': 'rejected',
+        'reason': reason,
+        'message': message,
+        'query': sql
+    }
+
+
+def reset_execution_time(connection):
+    """
+    Restores the server default MAX_EXECUTION_TIME before the pooled connection is reused
+    (by writes and long reports). A connection that can't be reset is discarded.
+    """
+    try:
+        connection.execute(text("SET SESSION MAX_EXECUTION_TIME = DEFAULT"))
+    except Exception as e:
+        print(f"Could not reset MAX_EXECUTION_TIME, discarding connection: {e}")
+        connection.invalidate()
+
+
+def run_guarded_query(engine, sql: str) -> dict:
+    """
+    Executes LLM-generated SQL with guardrails:
+    SELECT only, clamped LIMIT, per-statement MAX_EXECUTION_TIME and an EXPLAIN cost gate.
+
+    Args:
+        engine: SQLAlchemy engine of the chatbot database
+        sql: The query returned by the LLM
+
+    Returns:
+        dict: status 'ok' with columns and rows, or status 'rejected' with reason and message
+    """
+    sql = clean_sql(sql)
+
+    rejection = check_select_only(sql)
+    if rejection:
+        return rejected('not_select', rejection, sql)
+
+    # one row more than the limit tells whether the limit cut the result
+    sql = apply_row_limit(sql, SQL_ROW_LIMIT + 1)
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {SQL_MAX_EXECUTION_MS}"))
+            try:
+                plan = connection.execute(text(f"EXPLAIN {sql}")).mappings().all()
+                estimated_rows = estimate_plan_rows(plan)
+                if estimated_rows > SQL_MAX_ESTIMATED_ROWS:
+                    return rejected(
+                        'too_expensive',
+                        f"The query would scan about {estimated_rows} rows (limit {SQL_MAX_ESTIMATED_ROWS}).",
+                        sql
+                    )
+
+                result = connection.execution_options(stream_results=True).execute(text(sql))
+                compacted = compact_result(list(result.keys()), result, max_rows=SQL_ROW_LIMIT)
+                compacted.update({'status': 'ok', 'query': sql, 'estimated_rows': estimated_rows})
+                return compacted
+            finally:
+                reset_execution_time(connection)
+
+    except Exception as e:
+        errno = getattr(getattr(e, 'orig', None), 'errno', None)
+        if errno == MAX_EXECUTION_TIME_ERRNO:
+            return rejected('timeout', f"The query took longer than {SQL_MAX_EXECUTION_MS} ms and was stopped.", sql)
+        return rejected('error', str(e), sql)
+
+
+def update_column_stats(stats: dict, value):
+    """ Adds one value of the summarized remainder to the running column statistics """
+    if value is None:
+        stats['nulls'] += 1
+        return
+
+    if len(stats['distinct']) <= MAX_DISTINCT_VALUES:
+        stats['distinct'].add(value if isinstance(value, (int, float, str)) else str(value))
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        stats['sum'] += value
+        stats['numeric_count'] += 1
+    try:
+        stats['min'] = value if stats['min'] is None else min(stats['min'], value)
+        stats['max'] = value if stats['max'] is None else max(stats['max'], value)
+    except TypeError:
+        pass
+
+
+def describe_column_stats(column: str, stats: dict) -> str:
+    """ One-line summary of a column over the rows that were not shown """
+    parts = []
+    distinct = stats['distinct']
+    if len(distinct) > MAX_DISTINCT_VALUES:
+        parts.append(f"more than {MAX_DISTINCT_VALUES} distinct values")
+    elif distinct:
+        values = ", ".join(repr(v)[:MAX_SUMMARY_VALUE_CHARS] for v in sorted(distinct, key=str))
+        parts.append(f"{len(distinct)} distinct values: {values}")
+
+    if stats['numeric_count']:
+        parts.append(f"min {stats['min']}, max {stats['max']}, avg {stats['sum'] / stats['numeric_count']:.2f}")
+    elif stats['min'] is not None and len(distinct) > MAX_DISTINCT_VALUES:
+        parts.append(f"range {stats['min']} .. {stats['max']}")
+
+    if stats['nulls']:
+        parts.append(f"{stats['nulls']} empty")
+
+    return f"- {column}: {'; '.join(parts) or 'no values'}"
+
+
+def compact_result(columns, result, token_budget: int = SQL_RESULT_TOKEN_BUDGET, max_rows: int = None) -> dict:
+    """
+    Streams rows from the cursor until the token budget is used up and
+    summarizes the remaining rows (row count, distinct values, column aggregates).
+
+    Args:
+        columns: Column names of the result
+        result: Cursor/result supporting fetchmany()
+        token_budget: Maximum estimated tokens for the rows shown verbatim
+        max_rows: Row limit of the query; a further row only signals that the limit was reached
+
+    Returns:
+        dict: columns, shown rows, total_rows, truncated flag, limit_reached flag
+              (total_rows is then a lower bound) and remainder summary lines
+    """
+    rows = []
+    used_tokens = estimate_tokens(str(columns))
+    total_rows = 0
+    truncated = False
+    limit_reached = False
+    remainder_stats = {
+        column: {'distinct': set(), 'nulls': 0, 'min': None, 'max': None, 'sum': 0, 'numeric_count': 0}
+        for column in columns
+    }
+
+    while True:
+        batch = result.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+
+        for row in batch:
+            if max_rows is not None and total_rows >= max_rows:
+                limit_reached = True
+                break
+            row = tuple(row)
+            total_rows += 1
+
+            if not truncated:
+                row_tokens = estimate_tokens(str(row))
+                if used_tokens + row_tokens <= token_budget:
+                    rows.append(row)
+                    used_tokens += row_tokens
+                    continue
+                truncated = True
+
+            for column, value in zip(columns, row):
+                update_column_stats(remainder_stats[column], value)
+
+        if limit_reached:
+            break
+
+    summary = []
+    if truncated:
+        summary = [describe_column_stats(column, remainder_stats[column]) for column in columns]
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'total_rows': total_rows,
+        'truncated': truncated,
+        'limit_reached': limit_reached,
+        'remainder_summary': summary
+    }
+
+
+def format_query_result(result: dict) -> str:
+    """
+    Formats the result of run_guarded_query for the answer prompt
+    """
+    if result['status'] == 'rejected':
+        return (f"SQL Rejected (reason: {result['reason']})\n"
+                f"Query: {result['query']}\n"
+                f"Details: {result['message']}")
+
+    response = f"Columns: {result['columns']}\nRows: {result['rows']}"
+    total = f"at least {result['total_rows']}" if result.get('limit_reached') else str(result['total_rows'])
+    if result['truncated']:
+        hidden = result['total_rows'] - len(result['rows'])
+        response += (f"\n\nTRUNCATED: showing {len(result['rows'])} of {total} rows. "
+                     f"Summary of the {hidden} rows not shown:\n")
+        response += "\n".join(result['remainder_summary'])
+    if result.get('limit_reached'):
+        response += (f"\n\nROW LIMIT REACHED: only the first {result['total_rows']} rows were read. "
+                     f"The query matches {total} rows; the exact number is unknown.")
+    return response
+
+
+def column_label(column: str) -> str:
+    """ Turns a column name like 'task_description' into 'Task description' """
+    return column.replace('_', ' ').strip().capitalize()
+
+
+def format_cell(value) -> str:
+    """ Renders a value for a markdown table cell """
+    if value is None:
+        return "-"
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d.%m.%Y')
+    return str(value).replace('|', '\\|').replace('\n', ' ')
+
+
+def render_direct_answer(result: dict):
+    """
+    Renders small, well-shaped results directly as a markdown list or table.
+
+    Returns:
+        str: The rendered answer, or None if the result is empty, large or ambiguous
+             and should be explained by the answer LLM instead
+    """
+    if result.get('status') != 'ok' or result.get('truncated') or result.get('limit_reached'):
+        return None
+
+    columns, rows = result['columns'], result['rows']
+    if not rows or len(rows) > DIRECT_ANSWER_MAX_ROWS or len(columns) > DIRECT_ANSWER_MAX_COLUMNS:
+        return None
+
+    # A single value (e.g. a COUNT) or computed columns need an explanation
+    if len(rows) == 1 and len(columns) == 1:
+        return None
+    if any(not re.fullmatch(r"\w+", column) for column in columns):
+        return None
+    if any(len(str(value)) > DIRECT_ANSWER_MAX_CELL_CHARS for row in rows for value in row):
+        return None
+
+    labels = [column_label(column) for column in columns]
+
+    if len(columns) == 1:
+        items = "\n".join(f"- {format_cell(row[0])}" for row in rows)
+        return f"**{labels[0]}:**\n\n{items}"
+
+    lines = [
+        "| " + " | ".join(labels) + " |",
+        "|" + "---|" * len(labels)
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(format_cell(value) for value in row) + " |")
+    return "\n".join(lines)
+
+
+def record_answer_mode(mode: str):
+    """ Counts whether an answer was rendered directly or generated by the LLM """
+    with _answer_mode_lock:
+        _answer_mode_counts[mode] += 1
+
+
+def get_answer_mode_stats() -> dict:
+    """
+    Returns:
+        dict: direct and llm answer counts and the share of answers that skipped the LLM
+    """
+    with _answer_mode_lock:
+        direct, llm = _answer_mode_counts['direct'], _answer_mode_counts['llm']
+    total = direct + llm
+    return {
+        'direct': direct,
+        'llm': llm,
+        'bypass_rate': (direct / total * 100) if total > 0 else 0
+    }
@@ -0,0 +1,136 @@
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Chat messages kept in st.session_state; older ones stay in the database
+CHAT_WINDOW_MESSAGES = int(os.getenv("CHAT_WINDOW_MESSAGES", "30"))
+
+# AI suggestion results kept per session (least recently viewed are dropped first)
+AI_SUGGESTION_CACHE_SIZE = int(os.getenv("AI_SUGGESTION_CACHE_SIZE", "5"))
+
+# Success notices kept per session and how long they are shown
+SUCCESS_MESSAGES_MAX = 10
+SUCCESS_MESSAGE_SECONDS = 8
+
+# Upper bound for the chat transcript and suggestions of one session
+SESSION_MEMORY_BUDGET_BYTES = int(os.getenv("SESSION_MEMORY_BUDGET_BYTES", str(2 * 1024 * 1024)))
+
+# The budget never trims the transcript below this many messages
+MIN_WINDOW_MESSAGES = 4
+
+
+def estimate_size(obj) -> int:
+    """
+    Approximate memory footprint of plain session data (dicts, lists, strings, numbers)
+    """
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def set_messages(state, messages, window=CHAT_WINDOW_MESSAGES):
+    """ Replaces the transcript (e.g. with loaded history), keeping the newest window messages """
+    state['messages'] = list(messages)[-window:]
+    state['chat_history_expanded'] = False
+
+
+def prepend_messages(state, messages):
+    """
+    Puts older messages the user loaded on purpose before the transcript.
+    From then on the window no longer trims the transcript: dropping its oldest
+    messages would leave a gap before the next page of older messages.
+    Only enforce_memory_budget still limits it.
+    """
+    state['messages'] = list(messages) + list(state.get('messages') or [])
+    state['chat_history_expanded'] = True
+
+
+def append_message(state, role, content, window=CHAT_WINDOW_MESSAGES, message_id=None):
+    """
+    Adds a chat message and drops the oldest ones beyond the window
+    (unless older history was loaded with prepend_messages).
+    Dropped messages are persisted already and can be reloaded from the database.
+    """
+    messages = state.setdefault('messages', [])
+    messages.append({"role": role, "content": content, "message_id": message_id})
+    if len(messages) > window and not state.get('chat_history_expanded'):
+        del messages[:len(messages) - window]
+
+
+def remember_suggestion(state, task_id, result, max_entries=AI_SUGGESTION_CACHE_SIZE):
+    """ Stores an AI suggestion result, evicting the least recently used beyond max_entries """
+    suggestions = state.get('ai_suggestions')
+    if not isinstance(suggestions, OrderedDict):
+        suggestions = OrderedDict(suggestions or {})
+        state['ai_suggestions'] = suggestions
+    suggestions[task_id] = result
+    suggestions.move_to_end(task_id)
+    while len(suggestions) > max_entries:
+        suggestions.popitem(last=False)
+
+
+def get_suggestion(state, task_id):
+    """ Returns the stored suggestion result of a task (marking it as recently used) or None """
+    suggestions = state.get('ai_suggestions')
+    if not suggestions or task_id not in suggestions:
+        return None
+    if isinstance(suggestions, OrderedDict):
+        suggestions.move_to_end(task_id)
+    return suggestions[task_id]
+
+
+def forget_suggestion(state, task_id):
+    suggestions = state.get('ai_suggestions')
+    if suggestions:
+        suggestions.pop(task_id, None)
+
+
+def add_success_message(state, message, notes=None, max_entries=SUCCESS_MESSAGES_MAX):
+    """ Queues a success notice; only the newest max_entries are kept """
+    messages = state.setdefault('success_messages', [])
+    messages.append({'message': message, 'notes': notes, 'timestamp': datetime.now()})
+    if len(messages) > max_entries:
+        del messages[:len(messages) - max_entries]
+
+
+def pop_recent_success_messages(state, max_age_seconds=SUCCESS_MESSAGE_SECONDS):
+    """
+    Returns the success notices younger than max_age_seconds and drops the expired ones
+    """
+    cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+    recent = [msg for msg in state.get('success_messages') or [] if msg['timestamp'] > cutoff]
+    state['success_messages'] = recent
+    return recent
+
+
+def enforce_memory_budget(state, budget=SESSION_MEMORY_BUDGET_BYTES):
+    """
+    Keeps transcript and suggestions of a session below budget bytes:
+    least recently used suggestions go first, then the oldest messages.
+
+    return:
+        int: Estimated bytes used afterwards
+    """
+    def used():
+        return sum(estimate_size(state.get(key)) for key in ('messages', 'ai_suggestions', 'success_messages'))
+
+    size = used()
+    suggestions = state.get('ai_suggestions')
+    while size > budget and suggestions:
+        if isinstance(suggestions, OrderedDict):
+            suggestions.popitem(last=False)
+        else:
+            suggestions.pop(next(iter(suggestions)))
+        size = used()
+
+    messages = state.get('messages') or []
+    while size > budget and len(messages) > MIN_WINDOW_MESSAGES:
+        del messages[0]
+        size = used()
+    return size
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from dotenv import load_dotenv
+from auth import get_user_by_id
+
+load_dotenv()
+
+# Signed session tokens replace the user row in st.session_state
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(8 * 60 * 60)))
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+
+_session_secret = os.getenv("SESSION_SECRET")
+if not _session_secret:
+    print("SESSION_SECRET is not set; using a random secret, sessions end when the server restarts.")
+    _session_secret = secrets.token_hex(32)
+SESSION_SECRET = _session_secret.encode('utf-8')
+
+# Server-side cache: session id -> (user dict, cache expiry)
+_session_cache = {}
+_revoked_sessions = {}  # session id -> token expiry
+_session_cache_lock = threading.Lock()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SESSION_SECRET, payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def create_session(user: dict) -> str:
+    """
+    Creates a signed, expiring session token for an authenticated user
+    and caches the user server-side.
+
+    return:
+        str: The session token to keep in st.session_state
+    """
+    claims = {
+        'sid': secrets.token_urlsafe(16),
+        'uid': user['user_id'],
+        'exp': int(time.time()) + SESSION_TTL_SECONDS
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+
+    with _session_cache_lock:
+        _session_cache[claims['sid']] = (user, time.time() + SESSION_CACHE_TTL_SECONDS)
+
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_session_token(token: str):
+    """
+    Verifies signature and expiry of a token.
+
+    return:
+        dict: The token claims, or None if the token is invalid or expired
+    """
+    if not token or '.' not in token:
+        return None
+
+    payload, signature = token.rsplit('.', 1)
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+
+    if claims.get('exp', 0) < time.time() or claims.get('sid') in _revoked_sessions:
+        return None
+    return claims
+
+
+def get_session_user(token: str):
+    """
+    Resolves a session token to its user without a database round trip
+    while the cached entry is fresh.
+
+    return:
+        dict: user_id, username, email, user_type - or None if not logged in
+    """
+    claims = read_session_token(token)
+    if not claims:
+        return None
+
+    now = time.time()
+    with _session_cache_lock:
+        cached = _session_cache.get(claims['sid'])
+    if cached and cached[1] > now:
+        return cached[0]
+
+    user = get_user_by_id(claims['uid'])
+    if user is None:
+        return None
+
+    with _session_cache_lock:
+        _session_cache[claims['sid']] = (user, now + SESSION_CACHE_TTL_SECONDS)
+        # drop expired entries while we hold the lock
+        for sid in [sid for sid, (_, expires) in _session_cache.items() if expires <= now]:
+            del _session_cache[sid]
+    return user
+
+
+def end_session(token: str):
+    """ Logs out: the token is rejected from now on """
+    claims = read_session_token(token)
+    if not claims:
+        return
+    with _session_cache_lock:
+        _session_cache.pop(claims['sid'], None)
+        _revoked_sessions[claims['sid']] = claims['exp']
+        # revoked tokens only need to be remembered until they expire anyway
+        now = time.time()
+        for sid in [sid for sid, expires in _revoked_sessions.items() if expires < now]:
+            del _revoked_sessions[sid]
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from db_utils import get_db_cursor
+
+
+def hash_text(text: str) -> str:
+    """ SHA-256 hex digest used to version prompts and task inputs """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def task_source_hash(simplification_inputs: dict) -> str:
+    """
+    Hashes the task fields that go into the simplification prompt.
+    A stored explanation is only valid while this hash is unchanged.
+    """
+    return hash_text(json.dumps(simplification_inputs, sort_keys=True, default=str))
+
+
+def get_all_task_inputs():
+    """
+    Gets the static fields of every task needed for the simplification prompt
+
+    return:
+        list[dict]: task_id, task_description, required_documents, step_title, phase_title
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute("""
+                       SELECT st.task_id,
+                              st.task_description,
+                              st.required_documents,
+                              ps.step_title,
+                              ph.phase_title
+                       FROM step_tasks st
+                       JOIN procedure_steps ps ON st.step_id = ps.step_id
+                       JOIN procedure_phases ph ON ps.phase_id = ph.phase_id
+                       ORDER BY st.task_id
+                       """)
+        return cursor.fetchall()
+
+
+def get_stored_simplification(task_id, source_hash, prompt_hash):
+    """
+    Returns the precomputed explanation of a task if it was generated
+    from the same task content and prompt version, otherwise None
+    """
+    try:
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute("""
+                           SELECT explanation FROM task_simplifications
+                           WHERE task_id = %s AND source_hash = %s AND prompt_hash = %s
+                           """, (task_id, source_hash, prompt_hash))
+            row = cursor.fetchone()
+            return row['explanation'] if row else None
+    except Exception as e:
+        print(f"Error reading stored simplification: {e}")
+        return None
+
+
+def get_stored_simplification_hashes():
+    """
+    return:
+        dict: task_id -> (source_hash, prompt_hash) of every stored explanation
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute("SELECT task_id, source_hash, prompt_hash FROM task_simplifications")
+        return {row['task_id']: (row['source_hash'], row['prompt_hash']) for row in cursor.fetchall()}
+
+
+def save_simplifications(rows):
+    """
+    Stores explanations, replacing older versions of the same task.
+
+    param:
+        rows(list[tuple]): (task_id, source_hash, prompt_hash, explanation)
+    """
+    if not rows:
+        return
+    with get_db_cursor() as (conn, cursor):
+        cursor.executemany("""
+                           INSERT INTO task_simplifications (task_id, source_hash, prompt_hash, explanation)
+                           VALUES (%s, %s, %s, %s)
+                           ON DUPLICATE KEY UPDATE
+                           source_hash = VALUES(source_hash),
+                           prompt_hash = VALUES(prompt_hash),
+                           explanation = VALUES(explanation)
+                           """, rows)
+        conn.commit()
@@ -0,0 +1,464 @@
+import gzip
+import io
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+from db_utils import get_db_cursor
+
+try:
+    import zstandard
+except ImportError:  # optional, documents are gzip compressed without it
+    zstandard = None
+
+load_dotenv()
+
+# Saved documents live in UPLOAD_ROOT/<position_id>/<task_id>/
+UPLOAD_ROOT = "uploads"
+
+# Pending uploads wait here until their task is confirmed. Must be on the same
+# filesystem as uploads/, so confirming moves the file instead of copying it.
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(UPLOAD_ROOT, ".spool"))
+
+# Largest accepted upload
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Spooled files of abandoned sessions are deleted after this time
+UPLOAD_SPOOL_MAX_AGE_SECONDS = int(os.getenv("UPLOAD_SPOOL_MAX_AGE_SECONDS", str(6 * 3600)))
+
+# How often cleanup_spool() actually scans the spool directory
+SPOOL_CLEANUP_INTERVAL_SECONDS = 600
+
+SPOOL_CHUNK_BYTES = 64 * 1024
+
+# Compression of saved documents: "auto" (zstd if installed, otherwise gzip), "zstd", "gzip" or "none"
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION", "auto").lower()
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+# Suffix appended to the stored file name per codec; files without one are stored uncompressed
+COMPRESSION_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+# Content types that are compressed; already compressed formats (PDF, images, Office, archives) are stored as-is
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/xml', 'application/rtf', 'image/svg+xml')
+
+# Soft deleted document versions are kept this long before their files are removed
+DOCUMENT_RETENTION_DAYS = int(os.getenv("DOCUMENT_RETENTION_DAYS", "30"))
+
+# Versions kept per task document; older ones are soft deleted by the garbage collector
+DOCUMENT_KEEP_VERSIONS = int(os.getenv("DOCUMENT_KEEP_VERSIONS", "5"))
+
+# Files without a document_uploads row are only removed once they are this old
+# (a save writes the file shortly before inserting its row)
+DOCUMENT_GC_GRACE_SECONDS = int(os.getenv("DOCUMENT_GC_GRACE_SECONDS", "3600"))
+
+# How often the app starts a background garbage collection (0 disables it, e.g. when gc_uploads.py runs from cron)
+DOCUMENT_GC_INTERVAL_SECONDS = int(os.getenv("DOCUMENT_GC_INTERVAL_SECONDS", "3600"))
+
+# Rows or files handled per database round trip
+DOCUMENT_GC_BATCH_SIZE = 500
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+_last_document_gc = 0.0
+_document_gc_lock = threading.Lock()
+
+
+def spool_upload(uploaded_file, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Streams an uploaded file into the spool directory in chunks.
+    The returned handle is a small dict that can be kept in st.session_state
+    instead of the file itself.
+
+    param:
+        uploaded_file: Streamlit UploadedFile (any binary file-like object with .name)
+        max_bytes(int): Size limit
+
+    return:
+        dict: 'success', 'upload' (handle with name, path, size, file_id) and 'error'
+    """
+    size = getattr(uploaded_file, 'size', None)
+    if size is not None and size > max_bytes:
+        return {'success': False, 'upload': None,
+                'error': f"File is too large ({size / 1024 / 1024:.1f} MB, limit {max_bytes / 1024 / 1024:.1f} MB)"}
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=UPLOAD_SPOOL_DIR, suffix=".part")
+    written = 0
+    try:
+        uploaded_file.seek(0)
+        with os.fdopen(fd, "wb") as spool:
+            while chunk := uploaded_file.read(SPOOL_CHUNK_BYTES):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ValueError(f"File is too large (limit {max_bytes / 1024 / 1024:.1f} MB)")
+                spool.write(chunk)
+    except Exception as e:
+        os.remove(path)
+        print(f"Error spooling upload: {e}")
+        return {'success': False, 'upload': None, 'error': str(e)}
+
+    return {'success': True, 'error': None, 'upload': {
+        'name': uploaded_file.name,
+        'path': path,
+        'size': written,
+        'file_id': getattr(uploaded_file, 'file_id', None),
+    }}
+
+
+def read_spooled_text(upload):
+    """ Content of a spooled text upload, or None if the spool file is gone """
+    try:
+        with open(upload['path'], 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError as e:
+        print(f"Error reading spooled upload: {e}")
+        return None
+
+
+def commit_spooled_upload(upload, destination):
+    """ Moves the spool file to its final place (a rename, the content is not copied) """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.replace(upload['path'], destination)
+    except OSError:
+        # spool on another filesystem
+        shutil.move(upload['path'], destination)
+
+
+def discard_spooled_upload(upload):
+    """ Deletes the spool file of an upload that will not be saved """
+    try:
+        os.remove(upload['path'])
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_spool(max_age_seconds=UPLOAD_SPOOL_MAX_AGE_SECONDS, force=False):
+    """
+    Deletes spool files older than max_age_seconds (left behind by closed sessions).
+    Scans at most every SPOOL_CLEANUP_INTERVAL_SECONDS unless force is set.
+
+    return:
+        int: Number of deleted files
+    """
+    global _last_cleanup
+    with _cleanup_lock:
+        if not force and time.time() - _last_cleanup < SPOOL_CLEANUP_INTERVAL_SECONDS:
+            return 0
+        _last_cleanup = time.time()
+
+    if not os.path.isdir(UPLOAD_SPOOL_DIR):
+        return 0
+
+    deleted = 0
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(UPLOAD_SPOOL_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                deleted += 1
+        except FileNotFoundError:
+            continue
+    return deleted
+
+
+# =============================================================================
+# COMPRESSED DOCUMENT STORAGE
+# Saved documents are compressed on write, chosen by content type, and
+# decompressed on read. Both directions stream in SPOOL_CHUNK_BYTES chunks.
+# =============================================================================
+
+def choose_compression(filename, setting=UPLOAD_COMPRESSION):
+    """
+    Codec for a document: 'zstd', 'gzip' or None (stored uncompressed)
+
+    param:
+        filename(str): Original file name, its extension determines the content type
+        setting(str): UPLOAD_COMPRESSION value
+    """
+    content_type, encoding = mimetypes.guess_type(filename)
+    if setting == 'none' or encoding is not None or not (content_type or 'text/plain').startswith(COMPRESSIBLE_TYPES):
+        return None
+    if setting == 'gzip' or zstandard is None:
+        return 'gzip'
+    return 'zstd'
+
+
+def _open_compressed_writer(raw, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def write_document(source, destination, codec):
+    """
+    Streams a binary file-like object into destination, compressed with codec
+
+    return:
+        str: Path of the stored file (destination plus the codec's suffix)
+    """
+    path = destination + COMPRESSION_SUFFIXES.get(codec, '')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as raw:
+        if codec is None:
+            shutil.copyfileobj(source, raw, SPOOL_CHUNK_BYTES)
+        else:
+            with _open_compressed_writer(raw, codec) as writer:
+                shutil.copyfileobj(source, writer, SPOOL_CHUNK_BYTES)
+    return path
+
+
+def store_document(upload, destination, setting=UPLOAD_COMPRESSION):
+    """
+    Saves a spooled upload handle or a Streamlit UploadedFile at destination,
+    compressed according to its content type. Uncompressed spooled uploads are
+    only renamed; compressed ones are streamed from the spool file, which is removed.
+
+    return:
+        str: Path of the stored file, to be recorded in document_uploads
+    """
+    name = upload['name'] if isinstance(upload, dict) else upload.name
+    codec = choose_compression(name, setting)
+
+    if isinstance(upload, dict):
+        if codec is None:
+            commit_spooled_upload(upload, destination)
+            return destination
+        with open(upload['path'], 'rb') as source:
+            path = write_document(source, destination, codec)
+        discard_spooled_upload(upload)
+        return path
+
+    upload.seek(0)
+    return write_document(upload, destination, codec)
+
+
+def open_document(path):
+    """
+    Opens a stored document for streaming binary reads, decompressing on the fly.
+    The codec is taken from the file suffix, so files saved before compression
+    was introduced are read as they are.
+    """
+    if path.endswith(COMPRESSION_SUFFIXES['zstd']):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if path.endswith(COMPRESSION_SUFFIXES['gzip']):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_document_text(path, encoding='utf-8'):
+    """ Opens a stored document as a text stream (use as context manager) """
+    return io.TextIOWrapper(open_document(path), encoding=encoding)
+
+
+# =============================================================================
+# DOCUMENT GARBAGE COLLECTION
+# Reconciles UPLOAD_ROOT with document_uploads: old versions are soft deleted,
+# soft deleted versions past the retention period are removed (row and file)
+# and files without a row are deleted.
+# =============================================================================
+
+def prune_document_versions(keep=DOCUMENT_KEEP_VERSIONS, batch_size=DOCUMENT_GC_BATCH_SIZE):
+    """
+    Soft deletes all but the newest keep live versions of every task document,
+    one transaction per batch
+
+    return:
+        int: Number of soft deleted versions
+    """
+    pruned = 0
+    while True:
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute("""
+                           SELECT upload_id FROM (
+                               SELECT upload_id,
+                                      ROW_NUMBER() OVER (PARTITION BY position_id, task_id ORDER BY version DESC) AS rn
+                               FROM document_uploads
+                               WHERE deleted_at IS NULL
+                           ) versions
+                           WHERE versions.rn > %s
+                           LIMIT %s
+                           """, (keep, batch_size))
+            upload_ids = [row['upload_id'] for row in cursor.fetchall()]
+            if not upload_ids:
+                return pruned
+
+            placeholders = ", ".join(["%s"] * len(upload_ids))
+            cursor.execute(f"""
+                           UPDATE document_uploads SET deleted_at = NOW()
+                           WHERE upload_id IN ({placeholders}) AND deleted_at IS NULL
+                           """, tuple(upload_ids))
+            conn.commit()
+            pruned += len(upload_ids)
+
+
+def purge_deleted_documents(retention_days=DOCUMENT_RETENTION_DAYS, batch_size=DOCUMENT_GC_BATCH_SIZE):
+    """
+    Removes files and rows of versions soft deleted more than retention_days ago,
+    one transaction per batch
+
+    return:
+        int: Number of purged versions
+    """
+    purged = 0
+    while True:
+        with get_db_cursor() as (conn, cursor):
+            cursor.execute("""
+                           SELECT upload_id, file_path FROM document_uploads
+                           WHERE deleted_at < NOW() - INTERVAL %s DAY
+                           ORDER BY deleted_at
+                           LIMIT %s
+                           """, (retention_days, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return purged
+
+            for row in rows:
+                try:
+                    os.remove(row['file_path'])
+                except FileNotFoundError:
+                    pass
+
+            upload_ids = [row['upload_id'] for row in rows]
+            placeholders = ", ".join(["%s"] * len(upload_ids))
+            cursor.execute(f"DELETE FROM document_uploads WHERE upload_id IN ({placeholders})", tuple(upload_ids))
+            conn.commit()
+            purged += len(upload_ids)
+
+
+def _iter_document_files():
+    """
+    Streams (position_id, task_id, path, mtime) of the saved documents, one directory at a time.
+    Only the UPLOAD_ROOT/<position_id>/<task_id>/ layout is visited (not the spool directory).
+    """
+    if not os.path.isdir(UPLOAD_ROOT):
+        return
+    with os.scandir(UPLOAD_ROOT) as positions:
+        for position_dir in positions:
+            if not position_dir.is_dir() or not position_dir.name.isdigit():
+                continue
+            with os.scandir(position_dir.path) as tasks:
+                for task_dir in tasks:
+                    if not task_dir.is_dir() or not task_dir.name.isdigit():
+                        continue
+                    with os.scandir(task_dir.path) as files:
+                        for entry in files:
+                            try:
+                                if entry.is_file():
+                                    yield int(position_dir.name), int(task_dir.name), entry.path, entry.stat().st_mtime
+                            except FileNotFoundError:
+                                continue
+
+
+def _remove_orphans(batch, cutoff):
+    """ Deletes the files of a batch that no document_uploads row refers to """
+    keys = sorted({(position_id, task_id) for position_id, task_id, _, _ in batch})
+    placeholders = ", ".join(["(%s, %s)"] * len(keys))
+    # primary, not a replica: a lagging replica could miss the row of a new upload
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute(f"""
+                       SELECT file_path FROM document_uploads
+                       WHERE (position_id, task_id) IN ({placeholders})
+                       """, tuple(value for key in keys for value in key))
+        known = {os.path.normpath(row['file_path']) for row in cursor.fetchall()}
+
+    removed = 0
+    for _, _, path, mtime in batch:
+        if mtime < cutoff and os.path.normpath(path) not in known:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def remove_orphan_documents(grace_seconds=DOCUMENT_GC_GRACE_SECONDS, batch_size=DOCUMENT_GC_BATCH_SIZE):
+    """
+    Deletes document files that have no document_uploads row (e.g. left behind by
+    failed saves or by older versions of delete_uploaded_doc) and empty directories.
+    Files are streamed from disk and checked against the database in batches.
+
+    return:
+        int: Number of deleted files
+    """
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    batch = []
+    for document in _iter_document_files():
+        batch.append(document)
+        if len(batch) >= batch_size:
+            removed += _remove_orphans(batch, cutoff)
+            batch = []
+    if batch:
+        removed += _remove_orphans(batch, cutoff)
+
+    # drop empty task and position directories, deepest first
+    if os.path.isdir(UPLOAD_ROOT):
+        for directory, _, _ in os.walk(UPLOAD_ROOT, topdown=False):
+            if directory == UPLOAD_ROOT or os.path.abspath(directory) == os.path.abspath(UPLOAD_SPOOL_DIR):
+                continue
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass  # not empty
+    return removed
+
+
+def collect_document_garbage(keep_versions=DOCUMENT_KEEP_VERSIONS, retention_days=DOCUMENT_RETENTION_DAYS,
+                             grace_seconds=DOCUMENT_GC_GRACE_SECONDS, batch_size=DOCUMENT_GC_BATCH_SIZE):
+    """
+    Runs all document garbage collection steps. A database lock makes sure only
+    one app process or gc_uploads.py run collects at a time.
+
+    return:
+        dict: 'success', 'pruned', 'purged', 'orphans' and 'error'
+    """
+    with get_db_cursor() as (conn, cursor):
+        cursor.execute("SELECT GET_LOCK('document_gc', 0) AS locked")
+        if not cursor.fetchone()['locked']:
+            return {'success': False, 'pruned': 0, 'purged': 0, 'orphans': 0,
+                    'error': "Another document garbage collection is running"}
+        try:
+            pruned = prune_document_versions(keep_versions, batch_size)
+            purged = purge_deleted_documents(retention_days, batch_size)
+            orphans = remove_orphan_documents(grace_seconds, batch_size)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('document_gc')")
+            cursor.fetchall()
+    return {'success': True, 'pruned': pruned, 'purged': purged, 'orphans': orphans, 'error': None}
+
+
+def _run_document_gc():
+    try:
+        result = collect_document_garbage()
+        if result['success']:
+            print(f"Document GC: {result['pruned']} versions pruned, {result['purged']} purged, "
+                  f"{result['orphans']} orphan files removed")
+    except Exception as e:
+        print(f"Error collecting document garbage: {e}")
+
+
+def start_document_gc(interval_seconds=DOCUMENT_GC_INTERVAL_SECONDS):
+    """
+    Starts collect_document_garbage() in a background thread, at most every
+    interval_seconds per process (0 disables it)
+
+    return:
+        bool: True if a collection was started
+    """
+    global _last_document_gc
+    if interval_seconds <= 0:
+        return False
+    with _document_gc_lock:
+        if time.time() - _last_document_gc < interval_seconds:
+            return False
+        _last_document_gc = time.time()
+    threading.Thread(target=_run_document_gc, name="document-gc", daemon=True).start()
+    return True
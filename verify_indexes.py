@@ -0,0 +1,79 @@
+# verify_indexes.py
+# EXPLAINs every query of checklist_utils, hr_utils and history_search and fails if one of them
+# reads a table of the hot query shapes with a full table or full index scan.
+# Run against a database of realistic size (the optimizer scans tiny tables anyway).
+# Usage: python verify_indexes.py [--id 1]
+import argparse
+import sys
+import checklist_utils
+import history_search
+import hr_utils
+from db_utils import get_db_cursor
+
+# Tables covered by the composite indexes of migration 5
+INDEXED_TABLES = {'user_progress', 'ba_shared_progress', 'chat_messages', 'chat_sessions',
+                  'document_uploads', 'ba_members'}
+
+# EXPLAIN access types that read the whole table or index
+FULL_SCAN_TYPES = {'ALL', 'index'}
+
+parser = argparse.ArgumentParser(description="Checks that the hot queries use indexes")
+parser.add_argument("--id", type=int, default=1, help="Sample value for every id parameter")
+args = parser.parse_args()
+
+sample = args.id
+queries = [
+    ("checklist_utils.SHARED_PROCEDURE_QUERY", checklist_utils.SHARED_PROCEDURE_QUERY, (sample,)),
+    ("checklist_utils.POSITION_BA_QUERY", checklist_utils.POSITION_BA_QUERY, (sample,)),
+    ("checklist_utils.LATEST_UPLOAD_QUERY", checklist_utils.LATEST_UPLOAD_QUERY, (sample, sample)),
+    ("checklist_utils.HR_POSITIONS_QUERY", checklist_utils.HR_POSITIONS_QUERY, ()),
+    ("checklist_utils.USER_POSITIONS_QUERY", checklist_utils.USER_POSITIONS_QUERY, (sample,)),
+    ("checklist_utils.CHAT_HISTORY_QUERY", checklist_utils.CHAT_HISTORY_QUERY.format(before_live=""),
+     (sample, sample, 50)),
+    ("checklist_utils.CHAT_HISTORY_WITH_ARCHIVE_QUERY",
+     checklist_utils.CHAT_HISTORY_WITH_ARCHIVE_QUERY.format(
+         before_live=checklist_utils.HISTORY_BEFORE_CONDITION.format(alias='cm'),
+         before_archive=checklist_utils.HISTORY_BEFORE_CONDITION.format(alias='cma')),
+     (sample, sample, "2030-01-01", "2030-01-01", sample, sample, sample, "2030-01-01", "2030-01-01", sample, 50)),
+    ("checklist_utils.REUSABLE_CHAT_SESSION_QUERY", checklist_utils.REUSABLE_CHAT_SESSION_QUERY, (sample, sample, 30)),
+    ("checklist_utils.SHARED_PROGRESS_COUNT_QUERY", checklist_utils.SHARED_PROGRESS_COUNT_QUERY, (sample,)),
+    ("checklist_utils.POSITION_TASKS_QUERY", checklist_utils.POSITION_TASKS_QUERY, (sample,)),
+    ("checklist_utils.PROGRESS_VERSION_QUERY", checklist_utils.PROGRESS_VERSION_QUERY, (sample,)),
+    ("checklist_utils.ROW_VERSIONS_QUERY",
+     checklist_utils.ROW_VERSIONS_QUERY.format(placeholders="%s, %s"), (sample, sample, sample + 1)),
+    ("checklist_utils.INSERT_UPLOAD_VERSION_STATEMENT", checklist_utils.INSERT_UPLOAD_VERSION_STATEMENT,
+     (sample, sample, sample, "sample.txt", "uploads/sample.txt", sample, sample)),
+    ("checklist_utils.LATEST_UPLOADS_QUERY", checklist_utils.LATEST_UPLOADS_QUERY, (sample,)),
+    ("checklist_utils.SOFT_DELETE_UPLOAD_STATEMENT", checklist_utils.SOFT_DELETE_UPLOAD_STATEMENT, (sample, sample)),
+    ("history_search.CHAT_SEARCH_QUERY", history_search.CHAT_SEARCH_QUERY,
+     ("+gutach*", "+gutach*", sample, sample, 10)),
+    ("history_search.NOTES_SEARCH_QUERY", history_search.NOTES_SEARCH_QUERY, ("+gutach*", "+gutach*", sample, 10)),
+    ("hr_utils.ACTIVE_POSITIONS_QUERY", hr_utils.ACTIVE_POSITIONS_QUERY, ()),
+    ("hr_utils.POSITION_COUNTS_QUERY", hr_utils.POSITION_COUNTS_QUERY, ()),
+    ("hr_utils.AVERAGE_PROGRESS_QUERY", hr_utils.AVERAGE_PROGRESS_QUERY, ()),
+    ("hr_utils.BA_GROUPS_QUERY", hr_utils.BA_GROUPS_QUERY, ()),
+    ("hr_utils.BA_MEMBERS_QUERY", hr_utils.BA_MEMBERS_QUERY, (sample,)),
+    ("hr_utils.AVAILABLE_USERS_QUERY", hr_utils.AVAILABLE_USERS_QUERY, ()),
+    ("hr_utils.PROCEDURES_QUERY", hr_utils.PROCEDURES_QUERY, ()),
+]
+
+failures = []
+with get_db_cursor() as (conn, cursor):
+    for name, sql, params in queries:
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = cursor.fetchall()
+
+        scans = [row for row in plan if row.get('table') in INDEXED_TABLES and row.get('type') in FULL_SCAN_TYPES]
+        for row in scans:
+            failures.append(f"{name}: full scan of {row['table']} (type {row['type']}, ~{row['rows']} rows)")
+
+        access = ", ".join(f"{row.get('table')}:{row.get('type')}/{row.get('key') or '-'}" for row in plan)
+        print(f"{'FAIL' if scans else 'ok  '} {name:<45} {access}")
+    conn.rollback()
+
+if failures:
+    print("\nQueries without a usable index:")
+    for failure in failures:
+        print(f"- {failure}")
+    sys.exit(1)
+print("\nAll queries use an index on the hot tables.")